@@ -1,19 +1,40 @@
-"""Global exception handlers for API errors."""
+"""Global exception handlers for API errors.
+
+Error bodies follow the ``ErrorResponse`` schema but are built as plain
+dicts: the fields come from our own exception classes, so there is
+nothing to validate on a path that may fire in bursts during an outage.
+"""
+from typing import Final
+
 from fastapi import Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 
 from app.core.logging import get_logger
-from app.models.video import ErrorResponse
 from app.services.errors import (
     VideoDownloaderError,
 )
 
 logger = get_logger(__name__)
 
+# Map exceptions to HTTP status codes
+_STATUS_CODE_MAP: Final[dict[str, int]] = {
+    "INVALID_URL": status.HTTP_400_BAD_REQUEST,
+    "UNSUPPORTED_PLATFORM": status.HTTP_422_UNPROCESSABLE_ENTITY,
+    "NOT_FOUND": status.HTTP_404_NOT_FOUND,
+    "FORMAT_NOT_AVAILABLE": status.HTTP_404_NOT_FOUND,
+    "YTDLP_FAILED": status.HTTP_502_BAD_GATEWAY,
+    "INTERNAL_ERROR": status.HTTP_500_INTERNAL_SERVER_ERROR,
+}
+
+_INTERNAL_ERROR_BODY: Final[dict[str, str]] = {
+    "code": "INTERNAL_ERROR",
+    "message": "An unexpected error occurred. Please try again later.",
+}
+
 
 async def video_downloader_error_handler(
     request: Request, exc: VideoDownloaderError
-) -> JSONResponse:
+) -> ORJSONResponse:
     """Handle all VideoDownloaderError exceptions.
 
     Args:
@@ -23,31 +44,21 @@ async def video_downloader_error_handler(
     Returns:
         JSON response with error details
     """
-    # Map exceptions to HTTP status codes
-    status_code_map = {
-        "INVALID_URL": status.HTTP_400_BAD_REQUEST,
-        "UNSUPPORTED_PLATFORM": status.HTTP_422_UNPROCESSABLE_ENTITY,
-        "NOT_FOUND": status.HTTP_404_NOT_FOUND,
-        "FORMAT_NOT_AVAILABLE": status.HTTP_404_NOT_FOUND,
-        "YTDLP_FAILED": status.HTTP_502_BAD_GATEWAY,
-        "INTERNAL_ERROR": status.HTTP_500_INTERNAL_SERVER_ERROR,
-    }
-
-    status_code = status_code_map.get(exc.code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+    status_code = _STATUS_CODE_MAP.get(
+        exc.code, status.HTTP_500_INTERNAL_SERVER_ERROR
+    )
 
     # Log error (excluding INVALID_URL which is expected user error)
-    if exc.code not in ["INVALID_URL"]:
+    if exc.code != "INVALID_URL":
         logger.warning(f"Domain error: {exc.code} - {exc.message}")
 
-    error_response = ErrorResponse(code=exc.code, message=exc.message)
-
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status_code,
-        content=error_response.model_dump(),
+        content={"code": exc.code, "message": exc.message},
     )
 
 
-async def generic_exception_handler(request: Request, exc: Exception) -> JSONResponse:
+async def generic_exception_handler(request: Request, exc: Exception) -> ORJSONResponse:
     """Handle unexpected exceptions.
 
     Args:
@@ -59,12 +70,7 @@ async def generic_exception_handler(request: Request, exc: Exception) -> JSONRes
     """
     logger.error(f"Unexpected error: {exc}", exc_info=True)
 
-    error_response = ErrorResponse(
-        code="INTERNAL_ERROR",
-        message="An unexpected error occurred. Please try again later.",
-    )
-
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        content=error_response.model_dump(),
+        content=_INTERNAL_ERROR_BODY,
     )
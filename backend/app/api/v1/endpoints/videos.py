@@ -1,17 +1,18 @@
 """Video-related API endpoints."""
 import asyncio
-import json
 import os
-import re
+import secrets
 import shutil
+import string
 import threading
 import uuid
-from collections.abc import AsyncIterator
+from functools import lru_cache
 from urllib.parse import quote
 
-from fastapi import APIRouter, HTTPException, Request, status
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, Header, HTTPException, Request, status
+from fastapi.responses import FileResponse, ORJSONResponse, Response
 from sse_starlette.sse import EventSourceResponse
+from starlette.background import BackgroundTask
 
 from app.core.config import settings
 from app.core.logging import get_logger
@@ -19,25 +20,36 @@ from app.core.rate_limit import limiter
 from app.models.video import (
     DownloadRequest,
     DownloadStartResponse,
+    Format,
     FormatsRequest,
     VideoInfo,
 )
 from app.services.download_tasks import (
     cleanup_stale,
     create_task,
+    find_task,
     get_task,
     remove_task,
 )
+from app.services.errors import InvalidUrlError
 from app.services.yt_dlp_service import YtDlpService
 
 logger = get_logger(__name__)
 
 router = APIRouter()
 
+# Settings are fixed for the life of the process; bind per-response values once
+_FILE_CHUNK_SIZE = settings.YTDLP_STREAM_CHUNK_SIZE
+
+# SSE streams wake on task updates but emit at most one frame per
+# flush interval; idle streams re-check the client connection on timeout.
+_SSE_FLUSH_INTERVAL = 0.25
+_SSE_IDLE_TIMEOUT = 1.0
+
 
 @router.post(
     "/formats",
-    response_model=VideoInfo,
+    response_class=ORJSONResponse,
     status_code=status.HTTP_200_OK,
     summary="Fetch video formats",
     description="Retrieve metadata and available formats for a video URL",
@@ -54,9 +66,14 @@ router = APIRouter()
     },
 )
 @limiter.limit("10/minute")
-async def fetch_formats(request: Request, body: FormatsRequest) -> VideoInfo:
+async def fetch_formats(request: Request, body: FormatsRequest) -> Response:
     """Fetch available formats for a video URL.
 
+    The payload is dumped once and returned as a ready-made response so
+    FastAPI skips its response-model validation and ``jsonable_encoder``
+    pass; the ``VideoInfo`` schema is still advertised via ``responses``.
+    In-memory cache hits ship the pre-serialized body without a thread hop.
+
     Args:
         request: Request containing the video URL
 
@@ -66,11 +83,63 @@ async def fetch_formats(request: Request, body: FormatsRequest) -> VideoInfo:
     Raises:
         Various VideoDownloaderError exceptions (handled by global handler)
     """
+    entry = await YtDlpService.get_cached_entry_async(body.url)
+    if entry is not None:
+        return Response(content=entry.payload, media_type="application/json")
+
     # Run blocking yt-dlp call in a thread to avoid blocking the event loop
     video_info = await asyncio.to_thread(YtDlpService.fetch_formats, body.url)
-    return video_info
+    return ORJSONResponse(video_info.model_dump(mode="json"))
+
 
+def _require_admin(authorization: str | None) -> None:
+    """Reject the request unless it carries ``Bearer <ADMIN_TOKEN>``.
 
+    Admin endpoints answer 404 while ``ADMIN_TOKEN`` is unset, so they
+    are off by default and not advertised to anonymous clients.
+    """
+    token = settings.ADMIN_TOKEN
+    if not token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, credentials = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(
+        credentials.encode(), token.encode()
+    ):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@router.delete(
+    "/formats/cache",
+    status_code=status.HTTP_204_NO_CONTENT,
+    summary="Clear formats cache",
+    description="Drop all cached video metadata, in memory and on disk (requires ADMIN_TOKEN)",
+    responses={
+        403: {"description": "Missing or wrong admin token"},
+        404: {"description": "Admin endpoints disabled"},
+        429: {"description": "Rate limit exceeded"},
+    },
+)
+@limiter.limit("2/minute")
+async def clear_formats_cache(
+    request: Request, authorization: str | None = Header(default=None)
+) -> Response:
+    """Empty the formats cache so the next lookups re-extract metadata."""
+    _require_admin(authorization)
+    await asyncio.to_thread(YtDlpService.clear_cache)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+# ASCII translation table for header-safe filenames: keep alphanumerics,
+# hyphens and dots, map whitespace to "_" and drop everything else.
+_FILENAME_ALLOWED = frozenset(string.ascii_letters + string.digits + "-.")
+_FILENAME_TRANS = str.maketrans({
+    c: "_" if c in string.whitespace else None
+    for c in map(chr, range(128))
+    if c not in _FILENAME_ALLOWED
+})
+
+
+@lru_cache(maxsize=512)
 def _sanitize_filename(filename: str) -> str:
     """Sanitize a filename for safe use in Content-Disposition header.
 
@@ -80,22 +149,24 @@ def _sanitize_filename(filename: str) -> str:
     Returns:
         Sanitized filename safe for headers (ASCII only)
     """
-    # Remove or replace unsafe characters - only keep ASCII alphanumeric, spaces, hyphens, dots
-    # Use ASCII flag to ensure only ASCII characters are matched
-    filename = re.sub(r'[^a-zA-Z0-9\s\-\.]', '', filename, flags=re.ASCII)
-    # Replace whitespace with underscores
-    filename = re.sub(r'\s+', '_', filename)
+    # Drop non-ASCII, then strip unsafe characters and turn whitespace into
+    # underscores in a single C-level pass
+    filename = filename.encode("ascii", "ignore").decode("ascii")
+    filename = filename.translate(_FILENAME_TRANS)
+    # "_" is never kept from the input, so runs of it are collapsed whitespace
+    while "__" in filename:
+        filename = filename.replace("__", "_")
     # Limit length
-    if len(filename) > 200:
-        filename = filename[:200]
-    return filename or "download"
+    return filename[:200] or "download"
 
 
+@lru_cache(maxsize=512)
 def _build_content_disposition(filename: str) -> str:
     """Build Content-Disposition header with proper encoding for non-ASCII filenames.
 
     Uses RFC 5987 encoding to support Unicode filenames while maintaining
-    compatibility with older browsers.
+    compatibility with older browsers.  Memoized: the header is a pure
+    function of the filename, and retries of the same video are common.
 
     Args:
         filename: Original filename (may contain Unicode characters)
@@ -116,32 +187,6 @@ def _build_content_disposition(filename: str) -> str:
     return f"attachment; filename=\"{ascii_filename}\"; filename*=UTF-8''{encoded_filename}"
 
 
-async def _stream_file(
-    file_path: str,
-    temp_dir: str,
-) -> AsyncIterator[bytes]:
-    """Stream a temp file to the client, then clean up.
-
-    Args:
-        file_path: Path to the downloaded file
-        temp_dir: Temp directory to remove after streaming
-
-    Yields:
-        Chunks of file data
-    """
-    chunk_size = settings.YTDLP_STREAM_CHUNK_SIZE
-    try:
-        with open(file_path, "rb") as f:
-            while True:
-                chunk = await asyncio.to_thread(f.read, chunk_size)
-                if not chunk:
-                    break
-                yield chunk
-    finally:
-        shutil.rmtree(temp_dir, ignore_errors=True)
-
-
-
 # ---------------------------------------------------------------------------
 # Progress-tracked download endpoints (all formats)
 # ---------------------------------------------------------------------------
@@ -152,6 +197,23 @@ _active_downloads: dict[tuple[str, str], str] = {}
 _active_downloads_lock = threading.Lock()
 
 
+def _output_name_and_type(
+    video_info: VideoInfo, selected_format: Format, is_merged: bool
+) -> tuple[str, str]:
+    """Return the suggested filename and content type for a download.
+
+    Merged formats are always remuxed to MP4; single streams keep the
+    container reported by yt-dlp.
+    """
+    if is_merged:
+        ext = "mp4"
+        content_type = "video/mp4"
+    else:
+        ext = selected_format.mime_type.split("/")[-1]
+        content_type = selected_format.mime_type or "application/octet-stream"
+    return f"{video_info.title}.{ext}", content_type
+
+
 @router.post(
     "/download/start",
     response_model=DownloadStartResponse,
@@ -177,21 +239,31 @@ async def start_download(request: Request, body: DownloadRequest) -> DownloadSta
     to server disk first, the browser receives the file over a fast
     local transfer instead of being exposed to YouTube throttling.
     """
+    # Reject unsafe format IDs before any lookup, fetch or temp-dir work
+    if not YtDlpService.is_valid_format_id(body.format_id):
+        raise InvalidUrlError("Invalid format_id")
+
     # Housekeeping: remove stale tasks
     cleanup_stale()
 
     normalized_url = YtDlpService.normalize_url(body.url)
 
-    video_info = YtDlpService.get_cached_formats(normalized_url)
-    if video_info is None:
+    entry = await YtDlpService.get_cached_entry_async(normalized_url)
+    if entry is None:
         video_info = await asyncio.to_thread(
             YtDlpService.fetch_formats, normalized_url
         )
-
-    selected_format = next(
-        (fmt for fmt in video_info.formats if fmt.id == body.format_id),
-        None,
+        # fetch_formats has just stored this entry; reuse its format index
+        entry = await YtDlpService.get_cached_entry_async(normalized_url)
+    else:
+        video_info = entry.video_info
+    formats_by_id = (
+        entry.formats_by_id
+        if entry is not None
+        else {fmt.id: fmt for fmt in video_info.formats}
     )
+
+    selected_format = formats_by_id.get(body.format_id)
     if not selected_format:
         from app.services.errors import FormatNotAvailableError
 
@@ -201,16 +273,9 @@ async def start_download(request: Request, body: DownloadRequest) -> DownloadSta
 
     dedup_key = (normalized_url, body.format_id)
     is_merged = YtDlpService.is_merged_format(body.format_id)
-
-    # Determine filename and content type based on format type
-    if is_merged:
-        ext = "mp4"
-        content_type = "video/mp4"
-    else:
-        ext = selected_format.mime_type.split("/")[-1]
-        content_type = selected_format.mime_type or "application/octet-stream"
-
-    filename = f"{video_info.title}.{ext}"
+    filename, content_type = _output_name_and_type(
+        video_info, selected_format, is_merged
+    )
 
     # --- Deduplication: return existing task if still active ---
     with _active_downloads_lock:
@@ -242,8 +307,8 @@ async def start_download(request: Request, body: DownloadRequest) -> DownloadSta
                     normalized_url, body.format_id, task
                 )
         except Exception as exc:
-            task.status = "failed"
             task.error = str(exc)
+            task.set_status("failed")
         finally:
             # Release the deduplication slot once the download is finished
             with _active_downloads_lock:
@@ -267,39 +332,37 @@ async def download_progress(
     request: Request, download_id: str
 ) -> EventSourceResponse:
     """SSE endpoint streaming progress events for a download task."""
-    task = get_task(download_id)
+    task = find_task(download_id)
     if not task:
         raise HTTPException(status_code=404, detail="Download not found")
 
     async def _event_generator():
+        # Holding the task keeps it observable even if it leaves the store
+        # (file served, stale sweep) before this stream sees the end.
+        t = task
+        last_seq = -1
         while True:
             if await request.is_disconnected():
                 logger.debug(f"SSE client disconnected for task {download_id}")
                 break
 
-            t = get_task(download_id)
-            if not t:
-                break
+            # Coalesce: yt-dlp can print dozens of progress lines per
+            # interval, but the client only needs the latest state.
+            seq = t.dirty_seq
+            status = t.status
+            if seq != last_seq or status in ("completed", "failed"):
+                last_seq = seq
+                # Statuses never leave completed/failed, so a terminal
+                # status read here is also the one in the frame.
+                yield t.render_sse()
+
+                if status in ("completed", "failed"):
+                    break
 
-            data = {
-                "status": t.status,
-                "progress": round(t.progress, 1),
-                "phase": t.phase,
-                "speed": t.speed,
-                "eta": t.eta,
-                "file_size": t.file_size,
-                "downloaded_bytes": t.downloaded_bytes,
-                "total_bytes": t.total_bytes,
-            }
-            if t.error:
-                data["error"] = t.error
-
-            yield {"event": "progress", "data": json.dumps(data)}
-
-            if t.status in ("completed", "failed"):
-                break
+                # Let a burst of yt-dlp lines collapse into the next frame
+                await asyncio.sleep(_SSE_FLUSH_INTERVAL)
 
-            await asyncio.sleep(0.5)
+            await t.wait_for_update(last_seq, timeout=_SSE_IDLE_TIMEOUT)
 
     return EventSourceResponse(_event_generator())
 
@@ -314,8 +377,15 @@ async def download_progress(
         409: {"description": "Download not yet complete"},
     },
 )
-async def download_file(download_id: str) -> StreamingResponse:
-    """Serve the completed file for a finished download task."""
+async def download_file(download_id: str) -> FileResponse:
+    """Serve the completed file for a finished download task.
+
+    The file is stat()ed once and the result handed to ``FileResponse``
+    for ``Content-Length``/``ETag``.  The response supports range requests
+    and uses the server's ``pathsend`` extension for a zero-copy transfer
+    where available.  The temp dir is removed by a background task once
+    the body has been sent.
+    """
     task = get_task(download_id)
     if not task:
         raise HTTPException(status_code=404, detail="Download not found")
@@ -325,7 +395,13 @@ async def download_file(download_id: str) -> StreamingResponse:
             status_code=409, detail="Download not yet complete"
         )
 
-    if not task.file_path or not os.path.exists(task.file_path):
+    # One stat() serves both the existence check and FileResponse's headers
+    file_path = task.file_path
+    try:
+        stat_result = os.stat(file_path) if file_path else None
+    except OSError:
+        stat_result = None
+    if not file_path or stat_result is None:
         remove_task(download_id)
         raise HTTPException(
             status_code=410, detail="File no longer available"
@@ -333,18 +409,54 @@ async def download_file(download_id: str) -> StreamingResponse:
 
     filename = task.filename
     content_type = task.content_type
-    file_size = task.file_size
-    file_path = task.file_path
     temp_dir = task.temp_dir or os.path.dirname(file_path)
 
-    # Remove from task store; _stream_file cleans the temp dir after streaming
+    # Remove from task store; the background task cleans the temp dir
     remove_task(download_id)
 
-    return StreamingResponse(
-        _stream_file(file_path, temp_dir),
+    response = FileResponse(
+        file_path,
         media_type=content_type,
+        headers={"Content-Disposition": _build_content_disposition(filename)},
+        background=BackgroundTask(shutil.rmtree, temp_dir, ignore_errors=True),
+        stat_result=stat_result,
+    )
+    response.chunk_size = _FILE_CHUNK_SIZE
+    return response
+
+
+@router.head(
+    "/download/{download_id}/file",
+    summary="Probe a completed file",
+    description="Return size and type headers for a completed download without serving it",
+    responses={
+        200: {"description": "Headers for the completed file"},
+        404: {"description": "Download not found"},
+        409: {"description": "Download not yet complete"},
+    },
+)
+async def probe_download_file(download_id: str) -> Response:
+    """Answer a HEAD probe for the file ``GET`` on this path would serve.
+
+    Download managers issue ``HEAD`` before fetching to size their
+    progress UI.  The headers come from the task, so the probe neither
+    touches the file nor removes the task the following ``GET`` needs.
+    """
+    task = get_task(download_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Download not found")
+
+    if task.status != "completed":
+        raise HTTPException(
+            status_code=409, detail="Download not yet complete"
+        )
+
+    response = Response(
+        media_type=task.content_type,
         headers={
-            "Content-Disposition": _build_content_disposition(filename),
-            "Content-Length": str(file_size),
+            "Content-Disposition": _build_content_disposition(task.filename),
+            "Accept-Ranges": "bytes",
         },
     )
+    response.headers["content-length"] = str(task.file_size)
+    return response
@@ -14,7 +14,7 @@ from app.services.errors import (
     VideoNotFoundError,
     YtdlpFailedError,
 )
-from app.services.yt_dlp_service import FORMAT_ID_PATTERN, YtDlpService
+from app.services.yt_dlp_service import YtDlpService
 
 
 def _err(msg: str) -> None:
@@ -86,7 +86,7 @@ def _resolve_format_choice(
         if 1 <= idx <= len(info.formats):
             return info.formats[idx - 1].id
         return None
-    if FORMAT_ID_PATTERN.match(choice):
+    if YtDlpService.is_valid_format_id(choice):
         return choice
     return None
 
@@ -133,7 +133,7 @@ def cmd_download(
 
     if format_id:
         fmt = format_id.strip()
-        if not FORMAT_ID_PATTERN.match(fmt):
+        if not YtDlpService.is_valid_format_id(fmt):
             _err("Invalid format id (disallowed characters).")
             return 2
     elif non_interactive:
@@ -1,4 +1,5 @@
 """Application configuration using pydantic-settings."""
+from functools import cached_property
 from typing import Literal
 
 from pydantic import Field, field_validator
@@ -23,6 +24,14 @@ class Settings(BaseSettings):
     # API Configuration
     API_V1_PREFIX: str = "/api/v1"
 
+    # Concurrency
+    THREAD_POOL_SIZE: int = Field(
+        default=64,
+        ge=1,
+        le=512,
+        description="Worker threads in the event loop's default executor (asyncio.to_thread)",
+    )
+
     # CORS Configuration
     CORS_ORIGINS: str = Field(
         default="http://localhost:3000",
@@ -41,6 +50,10 @@ class Settings(BaseSettings):
         default="http,https",
         description="Comma-separated list of allowed URL schemes",
     )
+    ADMIN_TOKEN: str | None = Field(
+        default=None,
+        description="Bearer token for admin endpoints such as clearing the formats cache (unset disables them)",
+    )
 
     @field_validator("CORS_ORIGINS")
     @classmethod
@@ -48,22 +61,23 @@ class Settings(BaseSettings):
         """Ensure CORS_ORIGINS is properly formatted."""
         return v.strip()
 
-    @property
+    # Derived values are computed once: settings do not change at runtime.
+    @cached_property
     def cors_origins_list(self) -> list[str]:
         """Get CORS origins as a list."""
         return [origin.strip() for origin in self.CORS_ORIGINS.split(",") if origin.strip()]
 
-    @property
+    @cached_property
     def allowed_schemes_list(self) -> list[str]:
         """Get allowed URL schemes as a list."""
         return [scheme.strip().lower() for scheme in self.ALLOWED_URL_SCHEMES.split(",") if scheme.strip()]
 
-    @property
+    @cached_property
     def is_development(self) -> bool:
         """Check if running in development mode."""
         return self.ENV == "development"
 
-    @property
+    @cached_property
     def is_production(self) -> bool:
         """Check if running in production mode."""
         return self.ENV == "production"
@@ -87,6 +101,10 @@ class Settings(BaseSettings):
         default="50M",
         description="yt-dlp --http-chunk-size value (set empty/omit to disable)"
     )
+    YTDLP_ADAPTIVE_TUNING: bool = Field(
+        default=True,
+        description="Raise or lower concurrent fragments and buffer size per host from measured throughput"
+    )
     YTDLP_SOCKET_TIMEOUT: int = Field(
         default=30,
         ge=1,
@@ -97,10 +115,16 @@ class Settings(BaseSettings):
     YTDLP_FRAGMENT_RETRIES: int = Field(default=10, ge=0, le=50)
     YTDLP_EXTRACTOR_RETRIES: int = Field(default=3, ge=0, le=50)
     YTDLP_STREAM_CHUNK_SIZE: int = Field(
-        default=16777216,
+        default=1048576,
+        ge=65536,
+        le=67108864,
+        description="Bytes sent per HTTP body chunk when serving files (1MB matches typical socket buffers)"
+    )
+    YTDLP_PIPE_READ_SIZE: int = Field(
+        default=4194304,
         ge=65536,
         le=67108864,
-        description="Chunk size for StreamingResponse reads (16MB for optimal streaming)"
+        description="Read size for yt-dlp subprocess pipes; stream readers buffer up to 2x this"
     )
     YTDLP_USE_IOS_CLIENT: bool = Field(
         default=False,
@@ -170,6 +194,22 @@ class Settings(BaseSettings):
         le=2048,
         description="Max number of cached URLs (0 disables)"
     )
+    YTDLP_FORMATS_NEGATIVE_CACHE_TTL_SECONDS: int = Field(
+        default=30,
+        ge=0,
+        le=600,
+        description="How long not-found/unsupported results are remembered (0 disables)"
+    )
+    YTDLP_FORMATS_DISK_CACHE_PATH: str | None = Field(
+        default=None,
+        description="SQLite file backing a persistent second-level formats cache (unset disables)"
+    )
+    YTDLP_FORMATS_DISK_CACHE_MAXSIZE_BYTES: int = Field(
+        default=268435456,
+        ge=1048576,
+        le=17179869184,
+        description="Total payload bytes kept in the on-disk formats cache; oldest entries go first"
+    )
 
 
 # Global settings instance
@@ -6,6 +6,7 @@ from typing import Final
 
 from app.core.version import __version__
 from app.models.video import HealthResponse
+from app.services.download_tasks import list_active
 
 _YTDLP_TIMEOUT_SEC: Final[float] = 5.0
 
@@ -36,4 +37,5 @@ def run_health_checks() -> HealthResponse:
         ffmpeg_ok=ffmpeg_ok,
         yt_dlp_cli_ok=ytdlp_cli_ok,
         yt_dlp_version=ytdlp_version,
+        active_downloads=len(list_active()),
     )
@@ -2,26 +2,51 @@
 import logging
 import sys
 
+import orjson
+
 from app.core.config import settings
 
 
+class OrjsonFormatter(logging.Formatter):
+    """Render each record as one JSON object per line.
+
+    Messages are encoded with orjson, so quotes, newlines and tracebacks
+    in the message are escaped correctly.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """Serialize *record* to a JSON line."""
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "name": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry).decode()
+
+
 def setup_logging() -> None:
     """Configure structured logging for the application."""
     log_level = getattr(logging, settings.LOG_LEVEL.upper())
 
+    handler = logging.StreamHandler(sys.stdout)
+
     # Create formatter
     if settings.is_production:
         # JSON logs for production (easier for log aggregators)
-        log_format = '{"time":"%(asctime)s","level":"%(levelname)s","name":"%(name)s","message":"%(message)s"}'
+        handler.setFormatter(OrjsonFormatter())
     else:
         # Human-readable logs for development
-        log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+        handler.setFormatter(
+            logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        )
 
     # Configure root logger
     logging.basicConfig(
         level=log_level,
-        format=log_format,
-        handlers=[logging.StreamHandler(sys.stdout)],
+        handlers=[handler],
     )
 
     # Set third-party loggers to WARNING to reduce noise
@@ -5,11 +5,11 @@ denial-of-service.  Limits are intentionally generous for self-hosted
 use but prevent automated scraping and runaway retries.
 """
 
+from fastapi.responses import ORJSONResponse
 from slowapi import Limiter
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 from starlette.requests import Request
-from starlette.responses import JSONResponse
 
 from app.core.logging import get_logger
 
@@ -31,12 +31,12 @@ limiter = Limiter(key_func=_key_func)
 
 async def rate_limit_exceeded_handler(
     request: Request, exc: RateLimitExceeded
-) -> JSONResponse:
+) -> ORJSONResponse:
     """Return a structured JSON error when rate limit is hit."""
     logger.warning(
         f"Rate limit exceeded for {get_remote_address(request)}: {exc.detail}"
     )
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=429,
         content={
             "code": "RATE_LIMITED",
@@ -1,11 +1,14 @@
 """FastAPI application entry point."""
+import asyncio
 import glob
 import shutil
 from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from slowapi.errors import RateLimitExceeded
 
 from app.api.errors import generic_exception_handler, video_downloader_error_handler
@@ -42,10 +45,19 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     # Startup: clean up orphaned temp dirs from previous crashes
     _cleanup_orphaned_temp_dirs()
 
+    # Size the default executor for blocking yt-dlp / file work; the
+    # stdlib default of min(32, cpu_count + 4) starves under load.
+    executor = ThreadPoolExecutor(
+        max_workers=settings.THREAD_POOL_SIZE,
+        thread_name_prefix="ytdl-io",
+    )
+    asyncio.get_running_loop().set_default_executor(executor)
+
     yield
 
     # Shutdown: cancel in-flight downloads and clean up temp dirs
     logger.info("Shutting down application — cleaning up downloads…")
+    executor.shutdown(wait=False, cancel_futures=True)
     cleanup_all()
     _cleanup_orphaned_temp_dirs()
     logger.info("Shutdown complete")
@@ -86,6 +98,7 @@ def create_app() -> FastAPI:
         redoc_url="/redoc",
         openapi_url="/openapi.json",
         lifespan=lifespan,
+        default_response_class=ORJSONResponse,
     )
 
     # CORS middleware
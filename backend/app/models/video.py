@@ -1,7 +1,7 @@
 """Pydantic models for video-related API contracts."""
 from typing import Literal
 
-from pydantic import BaseModel, ConfigDict, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 
 
 class FormatsRequest(BaseModel):
@@ -15,14 +15,8 @@ class FormatsRequest(BaseModel):
         examples=["https://www.youtube.com/watch?v=dQw4w9WgXcQ"],
     )
 
-    @field_validator("url")
-    @classmethod
-    def validate_url(cls, v: str) -> str:
-        """Basic URL validation."""
-        v = v.strip()
-        if not v:
-            raise ValueError("URL cannot be empty")
-        return v
+    # Whitespace is stripped before the length constraints run
+    model_config = ConfigDict(str_strip_whitespace=True, frozen=True, extra="forbid")
 
 
 class DownloadRequest(BaseModel):
@@ -42,14 +36,8 @@ class DownloadRequest(BaseModel):
         examples=["22", "140", "best", "bestvideo[height<=1080]+bestaudio/best"],
     )
 
-    @field_validator("url", "format_id")
-    @classmethod
-    def validate_not_empty(cls, v: str) -> str:
-        """Ensure fields are not empty after stripping."""
-        v = v.strip()
-        if not v:
-            raise ValueError("Field cannot be empty")
-        return v
+    # Whitespace is stripped before the length constraints run
+    model_config = ConfigDict(str_strip_whitespace=True, frozen=True, extra="forbid")
 
 
 class Format(BaseModel):
@@ -81,7 +69,14 @@ class Format(BaseModel):
         description="True if this format contains only video (no audio)",
     )
 
+    # Sort keys filled in by the service when the format is built; not
+    # part of the API payload.  Priority: 0 best merged, 1 merged tier, 2 raw.
+    _height: int = PrivateAttr(default=0)
+    _priority: int = PrivateAttr(default=2)
+
     model_config = ConfigDict(
+        frozen=True,
+        extra="forbid",
         json_schema_extra={
             "example": {
                 "id": "22",
@@ -123,6 +118,8 @@ class VideoInfo(BaseModel):
     )
 
     model_config = ConfigDict(
+        frozen=True,
+        extra="forbid",
         json_schema_extra={
             "example": {
                 "title": "Example Video Title",
@@ -164,6 +161,8 @@ class ErrorResponse(BaseModel):
     )
 
     model_config = ConfigDict(
+        frozen=True,
+        extra="forbid",
         json_schema_extra={
             "example": {
                 "code": "INVALID_URL",
@@ -180,6 +179,8 @@ class DownloadStartResponse(BaseModel):
     filename: str = Field(..., description="Suggested filename when saving the file")
 
     model_config = ConfigDict(
+        frozen=True,
+        extra="forbid",
         json_schema_extra={
             "example": {
                 "download_id": "a1b2c3d4e5f67890",
@@ -212,3 +213,10 @@ class HealthResponse(BaseModel):
         default=None,
         description="Reported yt-dlp CLI version string, if available",
     )
+    active_downloads: int = Field(
+        default=0,
+        description="Number of downloads currently downloading or merging",
+        ge=0,
+    )
+
+    model_config = ConfigDict(frozen=True, extra="forbid")
@@ -1,27 +1,52 @@
 """In-memory task store for tracking download progress.
 
-Each merged download gets a ``DownloadTask`` that is updated in real-time
-by the yt-dlp subprocess reader thread.  The SSE endpoint polls the task
-and streams progress events to the browser.
+Each download gets a ``DownloadTask`` that its worker updates in real
+time.  Every update bumps ``dirty_seq`` and wakes the SSE streams blocked
+in :meth:`DownloadTask.wait_for_update`, which then stream the new state
+to the browser.  An idle stream only wakes on its timeout to check for a
+disconnected client.
 
 **Multi-process limitation:** Task state lives only in this Python process.
 Run uvicorn with ``UVICORN_WORKERS=1`` (default in ``backend/Dockerfile``) or use
 a single replica; otherwise ``download_id`` lookups may 404 on another worker.
 """
 
+import asyncio
+import heapq
 import shutil
+import sys
 import threading
 import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
+from typing import Any
+
+import orjson
 
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Every task draws status and content type from a tiny vocabulary; keep one
+# shared string object per value instead of one per task.
+_STATUSES: dict[str, str] = {
+    s: sys.intern(s)
+    for s in ("pending", "downloading", "merging", "completed", "failed")
+}
+
+# Progress frames are written as one pre-encoded bytes object each
+_SSE_PROGRESS_PREFIX = b"event: progress\ndata: "
+
 
-@dataclass
+@dataclass(slots=True, weakref_slot=True)
 class DownloadTask:
-    """Tracks the state and progress of a single download."""
+    """Tracks the state and progress of a single download.
+
+    The worker thread assigns fields directly without a lock; each store
+    of a single attribute is atomic under the GIL.  Readers that need
+    several fields together should use :meth:`snapshot`.
+    """
 
     task_id: str
     # Status values: pending | downloading | merging | completed | failed
@@ -40,15 +65,139 @@ class DownloadTask:
     downloaded_bytes: int = 0
     total_bytes: int = 0
     error: str | None = None
-    created_at: float = field(default_factory=time.time)
+    # Monotonic seconds: only used for ageing, immune to wall-clock steps
+    created_at: float = field(default_factory=time.monotonic)
+    # Bumped by the worker after each batch of field updates; the SSE
+    # stream only emits when it has moved since the last event.
+    dirty_seq: int = 0
+    # SSE streams blocked in wait_for_update(); replaced, never mutated,
+    # so the worker thread can iterate it without a lock.
+    _waiters: tuple[tuple[asyncio.AbstractEventLoop, asyncio.Event], ...] = field(
+        default=(), init=False, repr=False, compare=False
+    )
+
+    def set_status(self, status: str) -> None:
+        """Move to *status* (one of ``_STATUSES``) and flag the change.
+
+        Registered tasks also move between the ``_by_status`` index sets.
+        """
+        new_status = _STATUSES[status]
+        with _write_lock:
+            if _tasks.get(self.task_id) is self:
+                _by_status[self.status].discard(self.task_id)
+                _by_status[new_status].add(self.task_id)
+            self.status = new_status
+        self.touch()
+
+    def publish_progress(
+        self,
+        progress: float,
+        downloaded_bytes: int,
+        total_bytes: int,
+        speed: str,
+        eta: str,
+    ) -> None:
+        """Store one batch of progress fields from the worker and flag it."""
+        self.progress = progress
+        self.downloaded_bytes = downloaded_bytes
+        self.total_bytes = total_bytes
+        self.speed = speed
+        self.eta = eta
+        self.touch()
+
+    def touch(self) -> None:
+        """Record that progress fields changed (single writer: the worker).
+
+        Wakes every stream waiting in :meth:`wait_for_update` on its own
+        event loop.
+        """
+        self.dirty_seq += 1
+        for loop, event in self._waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # loop already closed; the waiter is going away
+
+    async def wait_for_update(self, last_seq: int, timeout: float) -> bool:
+        """Wait until ``dirty_seq`` moves past *last_seq*.
+
+        Returns ``False`` if *timeout* seconds pass with no update, so the
+        caller can check for a disconnected client.
+        """
+        if self.dirty_seq != last_seq:
+            return True
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        self._waiters = (*self._waiters, waiter)
+        try:
+            # Re-check: the worker may have touched before we registered
+            if self.dirty_seq != last_seq:
+                return True
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+            return True
+        except TimeoutError:
+            return False
+        finally:
+            self._waiters = tuple(w for w in self._waiters if w is not waiter)
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return the client-facing progress fields as one SSE payload.
+
+        All fields are read in one pass, so an event can be at most a few
+        worker writes out of step, never built from two separate polls.
+        """
+        data: dict[str, Any] = {
+            "status": self.status,
+            "progress": round(self.progress, 1),
+            "phase": self.phase,
+            "speed": self.speed,
+            "eta": self.eta,
+            "file_size": self.file_size,
+            "downloaded_bytes": self.downloaded_bytes,
+            "total_bytes": self.total_bytes,
+        }
+        error = self.error
+        if error:
+            data["error"] = error
+        return data
+
+    def render_sse(self) -> bytes:
+        """Return a complete ``progress`` SSE frame for the current state."""
+        return _SSE_PROGRESS_PREFIX + orjson.dumps(self.snapshot()) + b"\n\n"
 
 
 # ---------------------------------------------------------------------------
-# Global store  (dict + lock keeps things simple for a self-hosted app)
+# Global store  (copy-on-write dict: lock-free reads, serialized writes)
+#
+# Every request looks tasks up while writes only happen on
+# create/remove, so readers never take a lock.  Writers copy the
+# current dict under ``_write_lock`` and publish the new one by rebinding
+# ``_tasks``; a reader sees either the old or the new mapping, never a
+# half-updated one.  Published dicts must never be mutated in place.
 # ---------------------------------------------------------------------------
 
 _tasks: dict[str, DownloadTask] = {}
-_lock = threading.Lock()
+_write_lock = threading.Lock()
+
+# Weak index over every task ever created.  Once a task leaves ``_tasks``
+# it stays reachable through ``find_task`` for as long as someone (an SSE
+# stream, the worker thread) still holds it, and is freed with the last
+# reference.
+_tasks_weak: weakref.WeakValueDictionary[str, DownloadTask] = (
+    weakref.WeakValueDictionary()
+)
+
+# (created_at, task_id) min-heap so stale sweeps only touch expired tasks.
+# Guarded by ``_write_lock``; entries for removed tasks are dropped lazily.
+_expiry_heap: list[tuple[float, str]] = []
+
+# Deleting a multi-GB temp dir can take seconds; stale sweeps run on the
+# request path, so the deletions are batched onto a private worker.
+_gc_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="task-gc")
+
+# status -> IDs of registered tasks in that status, kept in step by
+# ``DownloadTask.set_status``.  Guarded by ``_write_lock``.
+_by_status: dict[str, set[str]] = {s: set() for s in _STATUSES}
+_ACTIVE_STATUSES = ("downloading", "merging")
 
 
 def create_task(
@@ -57,20 +206,39 @@ def create_task(
     content_type: str = "video/mp4",
 ) -> DownloadTask:
     """Create and register a new download task."""
+    global _tasks
+    content_type = sys.intern(content_type)
     task = DownloadTask(
         task_id=task_id,
         filename=filename,
         content_type=content_type,
     )
-    with _lock:
-        _tasks[task_id] = task
+    with _write_lock:
+        replaced = _tasks.get(task_id)
+        if replaced is not None:
+            _by_status[replaced.status].discard(task_id)
+        _tasks = {**_tasks, task_id: task}
+        _tasks_weak[task_id] = task
+        _by_status[task.status].add(task_id)
+        heapq.heappush(_expiry_heap, (task.created_at, task_id))
     return task
 
 
 def get_task(task_id: str) -> DownloadTask | None:
     """Get a task by ID (returns ``None`` if not found)."""
-    with _lock:
-        return _tasks.get(task_id)
+    return _tasks.get(task_id)
+
+
+def find_task(task_id: str) -> DownloadTask | None:
+    """Like :func:`get_task`, but also finds removed tasks still in use.
+
+    For readers that only observe a task (progress streams); anything
+    that acts on a task's files must use :func:`get_task`.
+    """
+    task = _tasks.get(task_id)
+    if task is None:
+        task = _tasks_weak.get(task_id)
+    return task
 
 
 def remove_task(task_id: str) -> DownloadTask | None:
@@ -78,24 +246,56 @@ def remove_task(task_id: str) -> DownloadTask | None:
 
     Does **not** clean up temp files — the caller decides when to do that.
     """
-    with _lock:
-        return _tasks.pop(task_id, None)
+    global _tasks
+    with _write_lock:
+        task = _tasks.get(task_id)
+        if task is not None:
+            _tasks = {tid: t for tid, t in _tasks.items() if tid != task_id}
+            _by_status[task.status].discard(task_id)
+    return task
+
+
+def list_active() -> list[str]:
+    """Return the IDs of tasks that are downloading or merging."""
+    with _write_lock:
+        return [tid for status in _ACTIVE_STATUSES for tid in _by_status[status]]
 
 
 def cleanup_stale(max_age: int = 1800) -> None:
-    """Remove tasks older than *max_age* seconds and delete their temp dirs."""
-    now = time.time()
-    stale_ids: list[str] = []
-    with _lock:
-        for tid, task in _tasks.items():
-            if now - task.created_at > max_age:
-                stale_ids.append(tid)
-
-    for tid in stale_ids:
-        task = remove_task(tid)
-        if task and task.temp_dir:
-            shutil.rmtree(task.temp_dir, ignore_errors=True)
-            logger.info(f"Cleaned up stale download task {tid}")
+    """Remove tasks older than *max_age* seconds and delete their temp dirs.
+
+    The store update is synchronous; temp dirs are removed in one batch on
+    a background thread so the caller never waits on the filesystem.
+
+    Only the expired prefix of ``_expiry_heap`` is visited.  Entries whose
+    task was already removed, or whose ID now belongs to a newer task, are
+    discarded as they surface.
+    """
+    global _tasks
+    now = time.monotonic()
+    stale: list[DownloadTask] = []
+    with _write_lock:
+        while _expiry_heap and now - _expiry_heap[0][0] > max_age:
+            created_at, tid = heapq.heappop(_expiry_heap)
+            task = _tasks.get(tid)
+            if task is not None and task.created_at == created_at:
+                stale.append(task)
+        if stale:
+            stale_ids = {t.task_id for t in stale}
+            _tasks = {tid: t for tid, t in _tasks.items() if tid not in stale_ids}
+            for t in stale:
+                _by_status[t.status].discard(t.task_id)
+
+    temp_dirs = [(t.task_id, t.temp_dir) for t in stale if t.temp_dir]
+    if temp_dirs:
+        _gc_executor.submit(_remove_temp_dirs, temp_dirs)
+
+
+def _remove_temp_dirs(temp_dirs: list[tuple[str, str]]) -> None:
+    """Delete the temp dirs of swept tasks (runs on ``_gc_executor``)."""
+    for tid, temp_dir in temp_dirs:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        logger.info("Cleaned up stale download task %s", tid)
 
 
 def cleanup_all() -> None:
@@ -104,16 +304,19 @@ def cleanup_all() -> None:
     Called during graceful shutdown to ensure no orphaned temp
     directories remain on disk.
     """
-    with _lock:
-        all_ids = list(_tasks.keys())
+    global _tasks
+    with _write_lock:
+        all_tasks = list(_tasks.values())
+        _tasks = {}
+        _expiry_heap.clear()
+        for ids in _by_status.values():
+            ids.clear()
 
     removed = 0
-    for tid in all_ids:
-        task = remove_task(tid)
-        if task and task.temp_dir:
+    for task in all_tasks:
+        if task.temp_dir:
             shutil.rmtree(task.temp_dir, ignore_errors=True)
             removed += 1
 
     if removed:
-        logger.info(f"Shutdown cleanup: removed {removed} download tasks")
-
+        logger.info("Shutdown cleanup: removed %s download tasks", removed)
@@ -4,6 +4,10 @@
 class VideoDownloaderError(Exception):
     """Base exception for video downloader errors."""
 
+    # BaseException creates its __dict__ lazily; with the two fields in
+    # slots it is never allocated for our errors.
+    __slots__ = ("message", "code")
+
     def __init__(self, message: str, code: str) -> None:
         """Initialize the error.
 
@@ -19,6 +23,8 @@ class VideoDownloaderError(Exception):
 class InvalidUrlError(VideoDownloaderError):
     """Raised when the provided URL is invalid or blocked."""
 
+    __slots__ = ()
+
     def __init__(self, message: str = "The provided URL is invalid or blocked") -> None:
         super().__init__(message, "INVALID_URL")
 
@@ -26,6 +32,8 @@ class InvalidUrlError(VideoDownloaderError):
 class UnsupportedPlatformError(VideoDownloaderError):
     """Raised when the platform is not supported by yt-dlp."""
 
+    __slots__ = ()
+
     def __init__(self, message: str = "This platform is not supported") -> None:
         super().__init__(message, "UNSUPPORTED_PLATFORM")
 
@@ -33,6 +41,8 @@ class UnsupportedPlatformError(VideoDownloaderError):
 class VideoNotFoundError(VideoDownloaderError):
     """Raised when the video is not found or unavailable."""
 
+    __slots__ = ()
+
     def __init__(self, message: str = "Video not found or unavailable") -> None:
         super().__init__(message, "NOT_FOUND")
 
@@ -40,6 +50,8 @@ class VideoNotFoundError(VideoDownloaderError):
 class FormatNotAvailableError(VideoDownloaderError):
     """Raised when the requested format is not available."""
 
+    __slots__ = ()
+
     def __init__(self, message: str = "The requested format is not available") -> None:
         super().__init__(message, "FORMAT_NOT_AVAILABLE")
 
@@ -47,5 +59,7 @@ class FormatNotAvailableError(VideoDownloaderError):
 class YtdlpFailedError(VideoDownloaderError):
     """Raised when yt-dlp execution fails unexpectedly."""
 
+    __slots__ = ()
+
     def __init__(self, message: str = "Video processing failed") -> None:
         super().__init__(message, "YTDLP_FAILED")
@@ -1,20 +1,31 @@
 """yt-dlp integration service for video metadata extraction and downloads."""
 
-import hashlib
+import asyncio
+import contextlib
+import copy
+import functools
 import ipaddress
 import os
 import re
+import secrets
 import shutil
+import sqlite3
 import subprocess
+import sys
 import tempfile
 import threading
-import uuid
+import time
+import zlib
+from collections import OrderedDict, deque
 from collections.abc import Callable
-from typing import Any
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import IO, Any, Generic, TypeVar, cast
 from urllib.parse import urlparse
 
+import orjson
 import yt_dlp
-from cachetools import TTLCache
+from yt_dlp.downloader.common import FileDownloader
 
 from app.core.config import settings
 from app.core.logging import get_logger
@@ -24,6 +35,7 @@ from app.services.errors import (
     FormatNotAvailableError,
     InvalidUrlError,
     UnsupportedPlatformError,
+    VideoDownloaderError,
     VideoNotFoundError,
     YtdlpFailedError,
 )
@@ -31,21 +43,25 @@ from app.services.ytdlp.constants import (
     BLOCKED_HOSTNAMES,
     CODEC_NONE,
     CODEC_UNKNOWN,
-    DESTINATION_RE,
-    ETA_RE,
-    FORMAT_ID_PATTERN,
+    FORMAT_ID_DELETE_TABLE,
     FORMAT_ID_UNKNOWN,
+    INFO_JSON_DROP_KEYS,
+    IPV4_CHARS,
     MERGE_TIERS,
-    MERGER_RE,
+    MERGED_FORMAT_IDS,
+    MERGED_FORMAT_PREFIXES,
+    MERGED_HEIGHT_SELECTOR_PARTS,
     MIME_APPLICATION_PREFIX,
     MIME_AUDIO_PREFIX,
     MIME_VIDEO_PREFIX,
-    PROGRESS_PCT_RE,
-    SIZE_OF_RE,
-    SPEED_RE,
+    PROGRESS_TEMPLATE,
+    SIMPLE_URL_RE,
     VIDEO_CONTAINER_EXTS,
 )
-from app.services.ytdlp.disk_space import check_disk_space, parse_size_bytes
+from app.services.ytdlp.disk_cache import FormatsDiskCache
+from app.services.ytdlp.disk_space import check_disk_space
+from app.services.ytdlp.pipe_reactor import get_pipe_reactor
+from app.services.ytdlp.tuning import DownloadTuning, ThroughputTuner
 from app.services.ytdlp.youtube_opts import (
     append_youtube_extractor_cli,
     youtube_extractor_args,
@@ -53,26 +69,292 @@ from app.services.ytdlp.youtube_opts import (
 
 logger = get_logger(__name__)
 
+# Settings are fixed for the life of the process; bind per-download values once.
+# A StreamReader only pauses its pipe past 2x its limit, so the limit is the
+# read size itself to keep buffering at ~2x ``YTDLP_PIPE_READ_SIZE``.
+_PIPE_BUFFER_LIMIT = settings.YTDLP_PIPE_READ_SIZE
+
+# Buffer size for yt-dlp subprocess pipes read with readline()/iteration
+_PIPE_BUFSIZE = 1024 * 1024
+
+# Recent yt-dlp error messages kept for error reporting from file downloads
+_STDERR_TAIL_LINES = 200
+
+# Wall-clock limit for a single download
+_DOWNLOAD_TIMEOUT_SECONDS = 3600
+
+# Number of formats-cache shards (power of two so a mask picks the shard)
+_CACHE_SHARDS = 16
+
+# Minimum seconds between progress publishes from a reader thread or hook
+_PROGRESS_PUBLISH_INTERVAL = 0.1
+
+
+class _YdlErrorLog:
+    """yt-dlp ``logger`` that keeps only the most recent error messages."""
+
+    def __init__(self) -> None:
+        self.errors: deque[str] = deque(maxlen=_STDERR_TAIL_LINES)
+
+    def debug(self, msg: str) -> None:
+        pass
+
+    def info(self, msg: str) -> None:
+        pass
+
+    def warning(self, msg: str) -> None:
+        pass
+
+    def error(self, msg: str) -> None:
+        self.errors.append(msg)
+
+    def text(self) -> str:
+        return "\n".join(self.errors)
+
+
+class _TransferMeter:
+    """Times the byte-transfer phase of a download for the tuner.
+
+    The clock runs from the first progress report to the last, so the
+    extraction before it and an ffmpeg merge after it are not counted.
+    The first media URL seen names the host that served the bytes.
+    """
+
+    __slots__ = ("started", "ended", "media_url")
+
+    def __init__(self) -> None:
+        self.started = 0.0
+        self.ended = 0.0
+        self.media_url: str | None = None
+
+    def tick(self, now: float, media_url: object) -> None:
+        if not self.started:
+            self.started = now
+        self.ended = now
+        if self.media_url is None and isinstance(media_url, str):
+            self.media_url = media_url
+
+    def on_progress(self, d: dict[str, Any]) -> None:
+        """Progress-hook adapter: tick with the hook's format URL."""
+        info = d.get("info_dict")
+        self.tick(time.monotonic(), info.get("url") if info else None)
+
+
+def _largest_output(temp_dir: str) -> tuple[str, int] | None:
+    """Return ``(path, size)`` of the largest visible file in *temp_dir*.
+
+    Picking the largest skips leftover ``.part`` files, thumbnails and
+    subtitle sidecars.  One ``scandir`` pass supplies names and cached
+    stat results, so each file is stat()ed at most once.
+    """
+    best: tuple[str, int] | None = None
+    with os.scandir(temp_dir) as it:
+        for entry in it:
+            if entry.name.startswith(".") or not entry.is_file():
+                continue
+            size = entry.stat().st_size
+            if best is None or size > best[1]:
+                best = (entry.path, size)
+    return best
+
+
+def _download_by_deadline(
+    opts: dict[str, Any],
+    url: str,
+    deadline: float,
+    cancelled: threading.Event,
+    temp_dir: str,
+) -> int:
+    """Run ``YoutubeDL.download`` on a worker thread bounded by *deadline*.
+
+    Hooks only fire while yt-dlp reports progress, so a stalled
+    extraction, a stream that stops sending updates or a hung ffmpeg
+    merge would never reach a deadline check.  Once *deadline* passes,
+    *cancelled* is set so the worker aborts at its next hook, and
+    ``DownloadCancelled`` is raised to the caller; a worker that only
+    returns afterwards removes *temp_dir* again in case it re-created it.
+    """
+    future: Future[int] = Future()
+
+    def _run() -> None:
+        try:
+            with yt_dlp.YoutubeDL(opts) as ydl:
+                return_code = ydl.download([url])
+        except BaseException as exc:
+            future.set_exception(exc)
+        else:
+            future.set_result(return_code)
+        if cancelled.is_set():
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+    threading.Thread(target=_run, name="ydl-download", daemon=True).start()
+    try:
+        return future.result(timeout=max(deadline - time.monotonic(), 0.0))
+    except TimeoutError:
+        cancelled.set()
+        raise yt_dlp.utils.DownloadCancelled("Download timed out (1-hour limit)") from None
+
+
+class _LazySafeUrl:
+    """``%s`` log argument that sanitizes its URL only when formatted.
+
+    Records filtered out by the log level never call ``__str__``, so they
+    skip the slicing and hashing; the first rendering is memoized.
+    """
+
+    __slots__ = ("_url", "_text")
+
+    def __init__(self, url: str) -> None:
+        self._url = url
+        self._text: str | None = None
+
+    def __str__(self) -> str:
+        if self._text is None:
+            self._text = YtDlpService._sanitize_url_for_logging(self._url)
+        return self._text
+
+
+@dataclass(frozen=True, slots=True)
+class CachedFormats:
+    """A formats-cache entry: the model, its JSON body and a format index.
+
+    ``info_json`` is the raw yt-dlp info dict for ``--load-info-json``; it
+    is only kept in memory, so entries promoted from disk have ``None``.
+    """
+
+    video_info: VideoInfo
+    payload: bytes
+    formats_by_id: dict[str, Format]
+    info_json: bytes | None = None
+
+    @classmethod
+    def from_video_info(
+        cls, video_info: VideoInfo, info_json: bytes | None = None
+    ) -> "CachedFormats":
+        """Build an entry, serializing and indexing *video_info* once up front."""
+        return cls(
+            video_info=video_info,
+            payload=orjson.dumps(video_info.model_dump(mode="json")),
+            formats_by_id={fmt.id: fmt for fmt in video_info.formats},
+            info_json=info_json,
+        )
+
+
+_V = TypeVar("_V")
+
+
+class _TimedDict(Generic[_V]):
+    """Minimal TTL + LRU map over an ``OrderedDict``, one per cache shard.
+
+    Values are stored with an integer ``monotonic_ns`` expiry, so a read
+    is one int comparison against the clock.  Reads drop an expired entry
+    lazily and move a live one to the back; an insert past *maxsize* pops
+    from the front, so both paths are O(1).
+
+    :meth:`get` is safe without a lock: each step is a single atomic
+    ``OrderedDict`` call, and a key evicted mid-read is just a miss or a
+    skipped recency bump.  Writers and :meth:`clear` hold the shard lock.
+    """
+
+    __slots__ = ("_d", "_maxsize", "_ttl_ns")
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self._d: OrderedDict[str, tuple[int, _V]] = OrderedDict()
+        self._maxsize = maxsize
+        self._ttl_ns = int(ttl * 1_000_000_000)
+
+    def __len__(self) -> int:
+        return len(self._d)
+
+    def get(self, key: str) -> _V | None:
+        item = self._d.get(key)
+        if item is None:
+            return None
+        if item[0] <= time.monotonic_ns():
+            self._d.pop(key, None)
+            return None
+        with contextlib.suppress(KeyError):
+            self._d.move_to_end(key)
+        return item[1]
+
+    def __setitem__(self, key: str, value: _V) -> None:
+        d = self._d
+        d[key] = (time.monotonic_ns() + self._ttl_ns, value)
+        d.move_to_end(key)
+        while len(d) > self._maxsize:
+            d.popitem(last=False)
+
+    def clear(self) -> None:
+        self._d.clear()
+
 
 class YtDlpService:
     """Service for interacting with yt-dlp."""
 
-    _formats_cache: TTLCache | None = None
-    _formats_cache_lock = threading.Lock()
+    # Independent (_TimedDict, lock) shards picked by URL hash, so lookups
+    # for different URLs don't serialize on one lock.
+    _formats_cache: list[tuple[_TimedDict[CachedFormats], threading.Lock]] | None = None
+    _formats_cache_lock = threading.Lock()  # guards lazy shard creation only
+    # Optional SQLite L2 behind the shards, opened on first use
+    _disk_cache: FormatsDiskCache | None = None
+    _disk_cache_checked = False
+    # Parsed YoutubeDL params for merged downloads, built on first use
+    _merged_opts_base: dict[str, Any] | None = None
+    # Observed per-host throughput for adaptive transfer options
+    _tuner = ThroughputTuner()
+    # Extraction YoutubeDL params, built from settings on first use
+    _ydl_opts_base: dict[str, Any] | None = None
+    # Settings-derived argv shared by every yt-dlp download command
+    _download_args_base: tuple[str, ...] | None = None
+    # Normalized URL -> (error type, message) for recent not-found /
+    # unsupported results, so retry storms don't re-run the extractor
+    _failure_cache: _TimedDict[tuple[type[VideoDownloaderError], str]] | None = None
+    _failure_cache_lock = threading.Lock()
+    # Normalized URL -> extraction already in flight, shared by concurrent
+    # misses so a burst of identical requests costs one upstream fetch
+    _inflight: dict[str, Future[VideoInfo]] = {}
+    _inflight_lock = threading.Lock()
 
     # ------------------------------------------------------------------
-    # Cache helpers (backed by cachetools.TTLCache)
+    # Cache helpers (sharded _TimedDict, optional SQLite L2)
     # ------------------------------------------------------------------
 
     @classmethod
-    def _get_cache(cls) -> TTLCache:
-        """Lazy-initialise and return the TTL cache."""
-        if cls._formats_cache is None:
-            cls._formats_cache = TTLCache(
-                maxsize=max(1, settings.YTDLP_FORMATS_CACHE_MAXSIZE),
-                ttl=max(1, settings.YTDLP_FORMATS_CACHE_TTL_SECONDS),
-            )
-        return cls._formats_cache
+    def _get_cache(cls, key: str) -> tuple[_TimedDict[CachedFormats], threading.Lock]:
+        """Lazy-initialise the shards and return the one owning *key*."""
+        shards = cls._formats_cache
+        if shards is None:
+            with cls._formats_cache_lock:
+                if cls._formats_cache is None:
+                    # Split the configured capacity evenly across shards
+                    per_shard = max(
+                        1, -(-settings.YTDLP_FORMATS_CACHE_MAXSIZE // _CACHE_SHARDS)
+                    )
+                    ttl = max(1, settings.YTDLP_FORMATS_CACHE_TTL_SECONDS)
+                    cls._formats_cache = [
+                        (_TimedDict(maxsize=per_shard, ttl=ttl), threading.Lock())
+                        for _ in range(_CACHE_SHARDS)
+                    ]
+                shards = cls._formats_cache
+        return shards[hash(key) & (_CACHE_SHARDS - 1)]
+
+    @classmethod
+    def _get_disk_cache(cls) -> FormatsDiskCache | None:
+        """Lazy-open the on-disk L2 cache, or return None if unconfigured."""
+        if not cls._disk_cache_checked:
+            with cls._formats_cache_lock:
+                path = settings.YTDLP_FORMATS_DISK_CACHE_PATH
+                if not cls._disk_cache_checked and path:
+                    try:
+                        cls._disk_cache = FormatsDiskCache(
+                            path,
+                            ttl_seconds=settings.YTDLP_FORMATS_CACHE_TTL_SECONDS,
+                            max_bytes=settings.YTDLP_FORMATS_DISK_CACHE_MAXSIZE_BYTES,
+                        )
+                    except sqlite3.Error as e:
+                        logger.warning("Formats disk cache disabled: %s", e)
+                cls._disk_cache_checked = True
+        return cls._disk_cache
 
     @classmethod
     def _cache_enabled(cls) -> bool:
@@ -83,21 +365,169 @@ class YtDlpService:
         )
 
     @classmethod
-    def get_cached_formats(cls, url: str) -> VideoInfo | None:
-        """Return cached VideoInfo for *url*, or None."""
-        normalized_url = cls.normalize_url(url)
+    def _raise_recent_failure(cls, normalized_url: str) -> None:
+        """Re-raise a not-found/unsupported result cached for *normalized_url*."""
+        cache = cls._failure_cache
+        if cache is None:
+            return
+        failure = cache.get(normalized_url)
+        if failure is not None:
+            error_type, message = failure
+            raise error_type(message)  # type: ignore[call-arg]
+
+    @classmethod
+    def _remember_failure(cls, normalized_url: str, error: VideoDownloaderError) -> None:
+        """Cache *error* for *normalized_url* for the negative-cache TTL."""
+        ttl = settings.YTDLP_FORMATS_NEGATIVE_CACHE_TTL_SECONDS
+        maxsize = settings.YTDLP_FORMATS_CACHE_MAXSIZE
+        if ttl <= 0 or maxsize <= 0:
+            return
+        with cls._failure_cache_lock:
+            if cls._failure_cache is None:
+                cls._failure_cache = _TimedDict(maxsize=maxsize, ttl=ttl)
+            cls._failure_cache[normalized_url] = (type(error), error.message)
+
+    @classmethod
+    def get_cached_entry(cls, url: str) -> CachedFormats | None:
+        """Return the cache entry for *url*, or None.
+
+        Keys are only stored after validation, so an exact hit on the
+        caller's string (a normalized URL or a raw alias of one) skips
+        ``normalize_url``; only misses pay for it.  An L1 miss falls
+        through to the SQLite L2, so event-loop callers should use
+        :meth:`get_cached_entry_async` instead.
+        """
+        entry, normalized_url = cls._memory_lookup(url)
+        if entry is not None or normalized_url is None:
+            return entry
+        return cls._disk_lookup(url, normalized_url)
+
+    @classmethod
+    async def get_cached_entry_async(cls, url: str) -> CachedFormats | None:
+        """Event-loop variant of :meth:`get_cached_entry`.
+
+        The in-memory read stays inline; only an L1 miss with a disk
+        cache configured hops to a worker thread for the SQLite lookup.
+        """
+        entry, normalized_url = cls._memory_lookup(url)
+        if entry is not None or normalized_url is None:
+            return entry
+        if not settings.YTDLP_FORMATS_DISK_CACHE_PATH or (
+            cls._disk_cache_checked and cls._disk_cache is None
+        ):
+            return None
+        return await asyncio.to_thread(cls._disk_lookup, url, normalized_url)
+
+    @classmethod
+    def _memory_lookup(cls, url: str) -> tuple[CachedFormats | None, str | None]:
+        """Return ``(L1 entry or None, normalized URL)`` for *url*.
+
+        The normalized URL is None when caching is off, in which case
+        *url* is still validated so callers see the same errors.
+        """
         if not cls._cache_enabled():
+            cls.normalize_url(url)
+            return None, None
+        # Lock-free read; a stale hit at the moment of eviction is harmless
+        cache, _ = cls._get_cache(url)
+        entry = cache.get(url)
+        if entry is not None:
+            return entry, url
+
+        normalized_url = cls.normalize_url(url)
+        if normalized_url != url:
+            cache, _ = cls._get_cache(normalized_url)
+            entry = cache.get(normalized_url)
+            if entry is not None:
+                cls._cache_store(url, entry)
+        return entry, normalized_url
+
+    @classmethod
+    def _disk_lookup(cls, url: str, normalized_url: str) -> CachedFormats | None:
+        """Load *normalized_url* from the L2 cache and promote it to L1."""
+        disk = cls._get_disk_cache()
+        payload = disk.get(normalized_url) if disk is not None else None
+        if payload is None:
+            return None
+        # Promote to L1, reusing the stored JSON as the response body
+        try:
+            video_info = VideoInfo.model_validate_json(payload)
+        except ValueError:
+            logger.warning("Discarding unreadable disk cache entry for %s", normalized_url)
             return None
-        with cls._formats_cache_lock:
-            return cls._get_cache().get(normalized_url)
+        entry = CachedFormats(
+            video_info=video_info,
+            payload=payload,
+            formats_by_id={fmt.id: fmt for fmt in video_info.formats},
+        )
+        cls._cache_store(normalized_url, entry)
+        if normalized_url != url:
+            cls._cache_store(url, entry)
+        return entry
+
+    @classmethod
+    def get_cached_formats(cls, url: str) -> VideoInfo | None:
+        """Return cached VideoInfo for *url*, or None."""
+        entry = cls.get_cached_entry(url)
+        return entry.video_info if entry is not None else None
+
+    @classmethod
+    def get_cached_formats_json(cls, url: str) -> bytes | None:
+        """Return the cached, pre-serialized VideoInfo JSON for *url*, or None."""
+        entry = cls.get_cached_entry(url)
+        return entry.payload if entry is not None else None
 
     @classmethod
-    def _cache_set_formats(cls, normalized_url: str, video_info: VideoInfo) -> None:
-        """Store *video_info* in the cache under *normalized_url*."""
+    def get_cached_info_json(cls, url: str) -> bytes | None:
+        """Return the cached raw info JSON for *url*, or None."""
+        entry = cls.get_cached_entry(url)
+        return entry.info_json if entry is not None else None
+
+    @classmethod
+    def _cache_store(cls, key: str, entry: CachedFormats) -> None:
+        """Put *entry* into the in-memory shard owning *key*."""
+        cache, lock = cls._get_cache(key)
+        with lock:
+            cache[key] = entry
+
+    @classmethod
+    def _cache_set_formats(
+        cls,
+        normalized_url: str,
+        video_info: VideoInfo,
+        raw_url: str | None = None,
+        *,
+        info_json: bytes | None = None,
+    ) -> None:
+        """Store *video_info* (and its JSON body) under *normalized_url*.
+
+        A differing *raw_url* that was validated into *normalized_url* is
+        kept as an in-memory alias for the same entry.
+        """
         if not cls._cache_enabled():
             return
-        with cls._formats_cache_lock:
-            cls._get_cache()[normalized_url] = video_info
+        entry = CachedFormats.from_video_info(video_info, info_json)
+        cls._cache_store(normalized_url, entry)
+        if raw_url is not None and raw_url != normalized_url:
+            cls._cache_store(raw_url, entry)
+        disk = cls._get_disk_cache()
+        if disk is not None:
+            disk.set(normalized_url, entry.payload)
+
+    @classmethod
+    def clear_cache(cls) -> None:
+        """Drop every cached formats entry, in memory and on disk."""
+        shards = cls._formats_cache
+        if shards is not None:
+            for cache, lock in shards:
+                with lock:
+                    cache.clear()
+        with cls._failure_cache_lock:
+            if cls._failure_cache is not None:
+                cls._failure_cache.clear()
+        disk = cls._get_disk_cache()
+        if disk is not None:
+            disk.clear()
 
     # ------------------------------------------------------------------
     # URL helpers
@@ -107,6 +537,10 @@ class YtDlpService:
     def normalize_url(url: str) -> str:
         """Normalize and validate a URL for safety.
 
+        Successful results are memoized per raw string, so the several
+        calls one request makes (cache lookup, command build, logging)
+        validate the URL once.  Rejections are not cached.
+
         Args:
             url: Raw URL string from user input
 
@@ -116,12 +550,30 @@ class YtDlpService:
         Raises:
             InvalidUrlError: If URL is malformed or blocked
         """
+        return _normalize_url_memo(url, settings.BLOCK_PRIVATE_NETWORKS)
+
+    @staticmethod
+    def _normalize_url_uncached(url: str) -> str:
+        """Validate *url*; see :meth:`normalize_url`."""
         url = url.strip()
 
+        # Fast path for the common plain https://host/path shape.  Anything
+        # that might be an IP literal or a blocked host takes the full path.
+        if (m := SIMPLE_URL_RE.fullmatch(url)) is not None:
+            hostname = m.group(2).lower()
+            if (
+                m.group(1).lower() in settings.allowed_schemes_list
+                and not IPV4_CHARS.issuperset(hostname)
+                and not (
+                    settings.BLOCK_PRIVATE_NETWORKS and hostname in BLOCKED_HOSTNAMES
+                )
+            ):
+                return url
+
         try:
             parsed = urlparse(url)
         except Exception as e:
-            logger.warning(f"Failed to parse URL: {e}")
+            logger.warning("Failed to parse URL: %s", e)
             raise InvalidUrlError("Malformed URL") from None
 
         if parsed.scheme.lower() not in settings.allowed_schemes_list:
@@ -135,29 +587,56 @@ class YtDlpService:
 
         # SSRF protection: block private networks
         if settings.BLOCK_PRIVATE_NETWORKS:
-            try:
-                ip = ipaddress.ip_address(parsed.hostname)
-                if ip.is_private or ip.is_loopback or ip.is_link_local:
-                    logger.warning(f"Blocked private network URL: {parsed.hostname}")
-                    raise InvalidUrlError("Private network URLs are not allowed")
-            except ValueError:
-                # Not an IP address, hostname is OK
-                pass
-
-            if parsed.hostname.lower() in BLOCKED_HOSTNAMES:
+            hostname = parsed.hostname
+            # Only dotted-digit or colon hosts can parse as IP literals, so
+            # DNS names skip ip_address() and its ValueError entirely
+            if ":" in hostname or IPV4_CHARS.issuperset(hostname):
+                try:
+                    ip = ipaddress.ip_address(hostname)
+                except ValueError:
+                    pass  # Not an IP address, hostname is OK
+                else:
+                    if ip.is_private or ip.is_loopback or ip.is_link_local:
+                        logger.warning("Blocked private network URL: %s", hostname)
+                        raise InvalidUrlError("Private network URLs are not allowed")
+
+            if hostname in BLOCKED_HOSTNAMES:
                 raise InvalidUrlError("Localhost URLs are not allowed")
 
         return url
 
     @staticmethod
     def _sanitize_url_for_logging(url: str) -> str:
-        """Create a safe version of URL for logging (hide query params)."""
-        try:
-            parsed = urlparse(url)
-            url_hash = hashlib.sha256(url.encode()).hexdigest()[:8]
-            return f"{parsed.scheme}://{parsed.hostname}{parsed.path} (hash:{url_hash})"
-        except Exception:
+        """Create a safe version of URL for logging (hide query params).
+
+        Only scheme, host and path are needed, so the URL is sliced with a
+        few ``str.find`` calls instead of a full ``urlparse``.  Credentials
+        and port are dropped from the host, matching ``ParseResult.hostname``.
+        """
+        sep = url.find("://")
+        if sep <= 0:
             return "invalid-url"
+        start = sep + 3
+        end = len(url)
+        for delim in "/?#":
+            i = url.find(delim, start, end)
+            if i >= 0:
+                end = i
+        host = url[start:end].rpartition("@")[2]
+        if host.startswith("["):
+            host = host[1:host.find("]")]
+        else:
+            host = host.partition(":")[0]
+        path = ""
+        if end < len(url) and url[end] == "/":
+            path = url[end:]
+            for delim in "?#":
+                i = path.find(delim)
+                if i >= 0:
+                    path = path[:i]
+        # Correlation id only, not a security boundary: CRC32 is enough
+        url_hash = format(zlib.crc32(url.encode()), "08x")
+        return f"{url[:sep]}://{host.lower()}{path} (hash:{url_hash})"
 
     # ------------------------------------------------------------------
     # Format normalisation helpers
@@ -200,14 +679,16 @@ class YtDlpService:
             or raw_format.get("id")
             or FORMAT_ID_UNKNOWN
         )
-        quality_label = YtDlpService._extract_quality_label(raw_format)
-        mime_type = YtDlpService._determine_mime_type(raw_format)
+        # Labels and MIME types repeat across formats and cached videos;
+        # interning makes every Format share one string object per value
+        quality_label = sys.intern(YtDlpService._extract_quality_label(raw_format))
+        mime_type = sys.intern(YtDlpService._determine_mime_type(raw_format))
         filesize = raw_format.get("filesize") or raw_format.get("filesize_approx")
 
         vcodec = raw_format.get("vcodec", CODEC_NONE)
         acodec = raw_format.get("acodec", CODEC_NONE)
 
-        return Format(
+        fmt = Format(
             id=format_id,
             quality_label=quality_label,
             mime_type=mime_type,
@@ -215,109 +696,82 @@ class YtDlpService:
             is_audio_only=(acodec != CODEC_NONE and vcodec == CODEC_NONE),
             is_video_only=(vcodec != CODEC_NONE and acodec == CODEC_NONE),
         )
+        # yt-dlp reports height as an int; no need to parse the label back
+        height = raw_format.get("height")
+        if isinstance(height, (int, float)):
+            fmt._height = int(height)
+        return fmt
 
     @classmethod
     def _normalize_formats(
         cls, raw_formats: list[dict[str, Any]]
-    ) -> list[Format]:
-        """Normalize and deduplicate formats from yt-dlp output."""
+    ) -> tuple[list[Format], set[int]]:
+        """Normalize and deduplicate formats from yt-dlp output.
+
+        Returns:
+            The formats and the set of heights offered by video formats
+        """
         if not raw_formats:
             raise FormatNotAvailableError("No formats available for this video")
 
-        formats: list[Format] = []
-        seen_ids: set[str] = set()
+        # Insertion-ordered, so it dedups and keeps first-seen order at once
+        formats_by_id: dict[str, Format] = {}
+        available_heights: set[int] = set()
 
         for raw_fmt in raw_formats:
             try:
                 fmt = cls._normalize_format(raw_fmt)
-                if fmt.id not in seen_ids and fmt.id != FORMAT_ID_UNKNOWN:
-                    formats.append(fmt)
-                    seen_ids.add(fmt.id)
+                if (
+                    fmt.id != FORMAT_ID_UNKNOWN
+                    and formats_by_id.setdefault(fmt.id, fmt) is fmt
+                ):
+                    if fmt._height and fmt.mime_type.startswith(MIME_VIDEO_PREFIX):
+                        available_heights.add(fmt._height)
             except Exception as e:
-                logger.debug(f"Skipping malformed format: {e}")
+                logger.debug("Skipping malformed format: %s", e)
                 continue
 
-        if not formats:
+        if not formats_by_id:
             raise FormatNotAvailableError("No valid formats found")
 
-        return formats
+        return list(formats_by_id.values()), available_heights
 
     # ------------------------------------------------------------------
     # Merged-format construction
     # ------------------------------------------------------------------
 
     @staticmethod
-    def _create_merged_formats(formats: list[Format]) -> list[Format]:
+    def _merged_height_selector(height: int) -> str:
+        """Return the H.264 + AAC merge selector capped at *height* pixels."""
+        return str(height).join(MERGED_HEIGHT_SELECTOR_PARTS)
+
+    @staticmethod
+    def _create_merged_formats(available_heights: set[int]) -> list[Format]:
         """Create merged format options (video+audio via ffmpeg).
 
         Prefer H.264 (avc1) + AAC (mp4a) codecs for maximum player
         compatibility (QuickTime, iOS, older browsers), with fallbacks
         to any available codec combination.
-        """
-        merged_formats: list[Format] = []
 
-        available_heights: set[int] = {
-            int(match.group(1))
-            for f in formats
-            if (match := re.search(r"(\d+)p", f.quality_label))
-            and MIME_VIDEO_PREFIX in f.mime_type
-        }
+        Args:
+            available_heights: Heights offered by the video's video formats
 
-        # Best-available merged option – stay within QuickTime-compatible
-        # codecs (H.264 video + AAC audio) only.  No bare "/best" fallback
-        # because it can pick VP9/Opus which QuickTime cannot play.
-        merged_formats.append(Format(
-            id=(
-                "bestvideo[vcodec^=avc1]+bestaudio[acodec^=mp4a]"
-                "/bestvideo[vcodec^=avc1]+bestaudio[acodec^=mp4]"
-                "/bestvideo[vcodec^=avc]+bestaudio[acodec^=mp4a]"
-                "/best[vcodec^=avc1]"
-                "/best[vcodec^=avc]"
-            ),
-            quality_label="Best Available (Merged)",
-            mime_type="video/mp4",
-            filesize_bytes=None,
-            is_audio_only=False,
-            is_video_only=False,
-        ))
-
-        # Resolution-specific merged formats – restrict to H.264 + AAC.
-        # No bare "/best[height<=N]" fallback (could yield VP9).
-        for height, label, _fmt_id in MERGE_TIERS:
-            if height in available_heights:
-                merged_formats.append(Format(
-                    id=(
-                        f"bestvideo[height<={height}][vcodec^=avc1]"
-                        f"+bestaudio[acodec^=mp4a]"
-                        f"/bestvideo[height<={height}][vcodec^=avc1]"
-                        f"+bestaudio[acodec^=mp4]"
-                        f"/bestvideo[height<={height}][vcodec^=avc]"
-                        f"+bestaudio[acodec^=mp4a]"
-                        f"/best[height<={height}][vcodec^=avc1]"
-                        f"/best[height<={height}][vcodec^=avc]"
-                    ),
-                    quality_label=f"{label} (Merged)",
-                    mime_type="video/mp4",
-                    filesize_bytes=None,
-                    is_audio_only=False,
-                    is_video_only=False,
-                ))
-
-        return merged_formats
+        Returns:
+            The best-available option followed by each offered height tier
+        """
+        # Tiers are immutable and prebuilt at import; sharing them across
+        # videos skips per-request model construction
+        return [
+            _BEST_MERGED_FORMAT,
+            *(fmt for height, fmt in _MERGED_TIER_FORMATS if height in available_heights),
+        ]
 
     @staticmethod
     def _sort_formats(formats: list[Format]) -> None:
         """Sort formats in-place: merged first, then by quality descending."""
 
-        def _sort_key(f: Format) -> tuple:
-            height_match = re.search(r"(\d+)p", f.quality_label)
-            height = int(height_match.group(1)) if height_match else 0
-            priority = (
-                0 if "best available" in f.quality_label.lower()
-                else 1 if "merged" in f.quality_label.lower()
-                else 2
-            )
-            return (priority, f.is_audio_only, -height)
+        def _sort_key(f: Format) -> tuple[int, bool, int]:
+            return (f._priority, f.is_audio_only, -f._height)
 
         formats.sort(key=_sort_key)
 
@@ -327,7 +781,19 @@ class YtDlpService:
 
     @classmethod
     def _build_ydl_options(cls) -> dict[str, Any]:
-        """Build yt-dlp configuration options for format extraction."""
+        """Return yt-dlp configuration options for format extraction.
+
+        Every option derives from process-lifetime settings, so the dict is
+        built once and each caller gets a shallow copy it may modify.
+        """
+        base = cls._ydl_opts_base
+        if base is None:
+            base = cls._ydl_opts_base = cls._make_ydl_options()
+        return base.copy()
+
+    @classmethod
+    def _make_ydl_options(cls) -> dict[str, Any]:
+        """Build the extraction options from settings."""
         ydl_opts: dict[str, Any] = {
             "quiet": True,
             "no_warnings": True,
@@ -400,9 +866,10 @@ class YtDlpService:
         thumbnail = info.get("thumbnail")
         duration = cls._extract_duration(info.get("duration"))
 
-        formats = cls._normalize_formats(info.get("formats", []))
-        merged_formats = cls._create_merged_formats(formats)
-        all_formats = merged_formats + formats
+        formats, available_heights = cls._normalize_formats(info.get("formats", []))
+        # Extend the short merged list in place rather than concatenating
+        all_formats = cls._create_merged_formats(available_heights)
+        all_formats.extend(formats)
         cls._sort_formats(all_formats)
 
         vid = info.get("id")
@@ -422,21 +889,21 @@ class YtDlpService:
 
     @classmethod
     def _handle_fetch_error(
-        cls, error: Exception, safe_url: str, url: str
+        cls, error: Exception, safe_url: _LazySafeUrl, url: str
     ) -> None:
         """Handle and transform yt-dlp errors into domain exceptions.
 
         Always raises; return type is ``None`` only for the type-checker.
         """
         if isinstance(error, yt_dlp.utils.UnsupportedError):
-            logger.warning(f"Unsupported platform for {safe_url}: {error}")
+            logger.warning("Unsupported platform for %s: %s", safe_url, error)
             raise UnsupportedPlatformError(str(error))
 
         if isinstance(error, yt_dlp.utils.DownloadError):
             error_msg = str(error).lower()
 
             if any(kw in error_msg for kw in ("not found", "unavailable", "private")):
-                logger.warning(f"Video not found: {safe_url}")
+                logger.warning("Video not found: %s", safe_url)
                 raise VideoNotFoundError()
 
             if "livestream" in error_msg:
@@ -446,10 +913,10 @@ class YtDlpService:
                 )
 
             if "format" in error_msg:
-                logger.warning(f"Format not available for {safe_url}: {error}")
+                logger.warning("Format not available for %s: %s", safe_url, error)
                 raise FormatNotAvailableError(f"No formats available: {error}")
 
-            logger.error(f"yt-dlp download error for {safe_url}: {error}")
+            logger.error("yt-dlp download error for %s: %s", safe_url, error)
             raise YtdlpFailedError(f"Failed to fetch video information: {error}")
 
         if isinstance(
@@ -464,7 +931,9 @@ class YtDlpService:
             raise error
 
         logger.error(
-            f"Unexpected error fetching formats for {safe_url}: {error}",
+            "Unexpected error fetching formats for %s: %s",
+            safe_url,
+            error,
             exc_info=True,
         )
         raise YtdlpFailedError(f"Unexpected error: {error}")
@@ -473,14 +942,18 @@ class YtDlpService:
     # Public API
     # ------------------------------------------------------------------
 
+    @staticmethod
+    def is_valid_format_id(format_id: str) -> bool:
+        """Return True when *format_id* is non-empty and only uses safe characters."""
+        return bool(format_id) and not format_id.translate(FORMAT_ID_DELETE_TABLE)
+
     @staticmethod
     def is_merged_format(format_id: str) -> bool:
         """Return True when *format_id* selects video+audio merge (ffmpeg)."""
         return (
             "+" in format_id
-            or format_id in {"best", "bestvideo"}
-            or format_id.startswith("best[")
-            or format_id.startswith("bestvideo[")
+            or format_id in MERGED_FORMAT_IDS
+            or format_id.startswith(MERGED_FORMAT_PREFIXES)
         )
 
     @classmethod
@@ -499,6 +972,30 @@ class YtDlpService:
             "--no-part",
             "--no-warnings",
             "--quiet",
+            *cls._shared_download_args(),
+        ]
+        if (tuning := cls._host_tuning(normalized_url)) is not None:
+            cmd.extend(tuning.cli_args())
+
+        cmd.append(normalized_url)
+        return cmd
+
+    @classmethod
+    def _shared_download_args(cls) -> tuple[str, ...]:
+        """Return the settings-derived argv every download command shares.
+
+        Settings are fixed at runtime, so the flags are built once and
+        spliced into each command; tests reset ``_download_args_base``.
+        """
+        base = cls._download_args_base
+        if base is None:
+            base = cls._download_args_base = cls._make_shared_download_args()
+        return base
+
+    @staticmethod
+    def _make_shared_download_args() -> tuple[str, ...]:
+        """Build the argv for :meth:`_shared_download_args`."""
+        cmd: list[str] = [
             "--no-playlist",
             "--remote-components", "ejs:github",
             "--concurrent-fragments", str(settings.YTDLP_CONCURRENT_FRAGMENTS),
@@ -512,23 +1009,74 @@ class YtDlpService:
         ]
         append_youtube_extractor_cli(cmd)
 
+        # Network optimizations
         if settings.YTDLP_SLEEP_REQUESTS > 0:
             cmd.extend(["--sleep-requests", str(settings.YTDLP_SLEEP_REQUESTS)])
+
+        # User agent spoofing
         if settings.YTDLP_USER_AGENT:
             cmd.extend(["--user-agent", settings.YTDLP_USER_AGENT])
+
         if settings.YTDLP_HTTP_CHUNK_SIZE:
             cmd.extend(["--http-chunk-size", settings.YTDLP_HTTP_CHUNK_SIZE])
+
+        # SponsorBlock: skip sponsor segments to reduce download time
         if settings.YTDLP_SPONSORBLOCK_REMOVE:
             cmd.extend(["--sponsorblock-remove", settings.YTDLP_SPONSORBLOCK_REMOVE])
+
+        # Cookies for authentication (file preferred over browser on servers)
         if settings.YTDLP_COOKIES_FILE:
             cmd.extend(["--cookies", settings.YTDLP_COOKIES_FILE])
         elif settings.YTDLP_COOKIES_FROM_BROWSER:
             cmd.extend(["--cookies-from-browser", settings.YTDLP_COOKIES_FROM_BROWSER])
+
+        # Proxy (can help with regional throttling)
         if settings.YTDLP_PROXY:
             cmd.extend(["--proxy", settings.YTDLP_PROXY])
+        return tuple(cmd)
 
-        cmd.append(normalized_url)
-        return cmd
+    @staticmethod
+    def _host_tuning(normalized_url: str) -> DownloadTuning | None:
+        """Return throughput-based transfer overrides for the URL's host."""
+        host = urlparse(normalized_url).hostname
+        return YtDlpService._tuner.tuning_for(host) if host else None
+
+    @classmethod
+    def _record_throughput(
+        cls, normalized_url: str, size_bytes: int, meter: _TransferMeter
+    ) -> None:
+        """Feed a finished transfer's rate to the tuner under its media host.
+
+        The page host is passed as the route, so the next download from
+        the same site is tuned from the edge that served this one.
+        """
+        media_host = urlparse(meter.media_url).hostname if meter.media_url else None
+        elapsed = meter.ended - meter.started
+        if media_host and elapsed > 0:
+            cls._tuner.record(
+                media_host,
+                size_bytes / elapsed,
+                via=urlparse(normalized_url).hostname,
+            )
+
+    @classmethod
+    def _merged_download_opts(
+        cls, format_id: str, output_template: str
+    ) -> dict[str, Any]:
+        """Return ``YoutubeDL`` params equivalent to the merged-download argv.
+
+        The argv from :meth:`_build_merged_download_cmd` is translated by
+        yt-dlp's own option parser once, so in-process downloads honour
+        exactly the same flags as the CLI.
+        """
+        base = cls._merged_opts_base
+        if base is None:
+            argv = cls._build_merged_download_cmd("", "best", "%(id)s.%(ext)s")
+            base = cls._merged_opts_base = yt_dlp.parse_options(argv[1:-1]).ydl_opts
+        opts = copy.deepcopy(base)
+        opts["format"] = format_id
+        opts["outtmpl"] = {"default": output_template}
+        return opts
 
     @classmethod
     def download_to_directory(
@@ -544,19 +1092,19 @@ class YtDlpService:
         Uses a temporary directory for yt-dlp output, then moves the file to
         ``{sanitized_title} [{video_id}].{ext}`` under *output_dir*.
         """
-        if not FORMAT_ID_PATTERN.match(format_id):
+        if not cls.is_valid_format_id(format_id):
             raise InvalidUrlError("Invalid format_id")
 
         info = video_info if video_info is not None else cls.fetch_formats(url)
         normalized_url = cls.normalize_url(url)
-        safe_url = cls._sanitize_url_for_logging(normalized_url)
+        safe_url = _LazySafeUrl(normalized_url)
 
         out_abs = os.path.abspath(os.path.expanduser(output_dir))
         os.makedirs(out_abs, exist_ok=True)
 
         check_disk_space()
         temp_dir = tempfile.mkdtemp(prefix="ytdl_cli_")
-        dl_id = uuid.uuid4().hex[:12]
+        dl_id = secrets.token_hex(6)
         work_template = os.path.join(temp_dir, f"{dl_id}.%(ext)s")
 
         if cls.is_merged_format(format_id):
@@ -564,21 +1112,22 @@ class YtDlpService:
                 normalized_url, format_id, work_template,
             )
         else:
-            cmd = cls.build_download_command(
-                url=url,
-                format_id=format_id,
-                progress=False,
-                output_file=work_template,
+            cmd = cls._build_single_download_cmd(
+                normalized_url, format_id, output_file=work_template,
             )
 
         logger.info(
-            f"CLI-style download to directory for format {format_id} from {safe_url}"
+            "CLI-style download to directory for format %s from %s",
+            format_id,
+            safe_url,
         )
 
         try:
+            # Output goes to a file; only stderr is kept for errors
             result = subprocess.run(
                 cmd,
-                capture_output=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
                 timeout=3600,
             )
         except subprocess.TimeoutExpired:
@@ -589,18 +1138,19 @@ class YtDlpService:
             stderr_text = result.stderr.decode(errors="replace")
             shutil.rmtree(temp_dir, ignore_errors=True)
             logger.error(
-                f"Download failed ({result.returncode}) for {safe_url}: "
-                f"{stderr_text[:500]}"
+                "Download failed (%s) for %s: %s",
+                result.returncode,
+                safe_url,
+                stderr_text[:500],
             )
             raise YtdlpFailedError(f"Download failed: {stderr_text[:400]}")
 
-        files = [f for f in os.listdir(temp_dir) if not f.startswith(".")]
-        if not files:
+        output = _largest_output(temp_dir)
+        if output is None:
             shutil.rmtree(temp_dir, ignore_errors=True)
             raise YtdlpFailedError("Download produced no output file")
 
-        paths = [os.path.join(temp_dir, f) for f in files]
-        actual_path = max(paths, key=os.path.getsize)
+        actual_path = output[0]
         ext = os.path.splitext(actual_path)[1] or ".mp4"
         vid = info.video_id or "video"
         base = cls._sanitize_cli_filename(info.title)
@@ -610,7 +1160,7 @@ class YtDlpService:
             os.remove(final_path)
         shutil.move(actual_path, final_path)
         shutil.rmtree(temp_dir, ignore_errors=True)
-        logger.info(f"Saved download to {final_path}")
+        logger.info("Saved download to %s", final_path)
         return final_path
 
     @staticmethod
@@ -636,14 +1186,63 @@ class YtDlpService:
             VideoNotFoundError: If video not found
             YtdlpFailedError: If yt-dlp fails unexpectedly
         """
-        url = cls.normalize_url(url)
-
         cached = cls.get_cached_formats(url)
         if cached is not None:
             return cached
 
-        safe_url = cls._sanitize_url_for_logging(url)
-        logger.info(f"Fetching formats for: {safe_url}")
+        raw_url = url
+        url = cls.normalize_url(url)
+
+        with cls._inflight_lock:
+            future = cls._inflight.get(url)
+            leader = future is None
+            if future is None:
+                future = cls._inflight[url] = Future()
+        if not leader:
+            # Another thread is already extracting this URL; share its result
+            return future.result()
+
+        try:
+            # A previous leader may have finished between our cache check
+            # and taking leadership
+            video_info = cls.get_cached_formats(url)
+            if video_info is None:
+                cls._raise_recent_failure(url)
+                try:
+                    video_info = cls._extract_formats(url, raw_url)
+                except (UnsupportedPlatformError, VideoNotFoundError) as e:
+                    cls._remember_failure(url, e)
+                    raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(video_info)
+            return video_info
+        finally:
+            with cls._inflight_lock:
+                del cls._inflight[url]
+
+    @staticmethod
+    def _encode_info_json(ydl: yt_dlp.YoutubeDL, info: dict[str, Any]) -> bytes | None:
+        """Serialize *info* the way ``--write-info-json`` would, or return None.
+
+        Download children are handed this on stdin via ``--load-info-json -``
+        so they skip re-extracting the URL.
+        """
+        slim = {k: v for k, v in info.items() if k not in INFO_JSON_DROP_KEYS}
+        try:
+            return orjson.dumps(ydl.sanitize_info(slim, remove_private_keys=True))
+        except (AttributeError, TypeError):
+            # sanitize_info assumes str keys; orjson rejects exotic values.
+            # Either way the child simply re-extracts.
+            return None
+
+    @classmethod
+    def _extract_formats(cls, url: str, raw_url: str) -> VideoInfo:
+        """Run yt-dlp extraction for normalized *url* and cache the result."""
+        safe_url = _LazySafeUrl(url)
+        logger.info("Fetching formats for: %s", safe_url)
 
         ydl_opts = cls._build_ydl_options()
 
@@ -655,11 +1254,15 @@ class YtDlpService:
                     raise VideoNotFoundError()
 
                 video_info = cls._extract_video_info(info)
-                cls._cache_set_formats(url, video_info)
+                cls._cache_set_formats(
+                    url, video_info, raw_url,
+                    info_json=cls._encode_info_json(ydl, info),
+                )
 
                 logger.info(
-                    f"Successfully fetched {len(video_info.formats)} formats "
-                    f"for: {safe_url}"
+                    "Successfully fetched %s formats for: %s",
+                    len(video_info.formats),
+                    safe_url,
                 )
                 return video_info
 
@@ -702,55 +1305,146 @@ class YtDlpService:
             InvalidUrlError: If URL or format_id is invalid
             YtdlpFailedError: If download or merge fails
         """
-        if not FORMAT_ID_PATTERN.match(format_id):
+        if not cls.is_valid_format_id(format_id):
             raise InvalidUrlError("Invalid format_id")
 
         normalized_url = cls.normalize_url(url)
-        safe_url = cls._sanitize_url_for_logging(normalized_url)
+        safe_url = _LazySafeUrl(normalized_url)
 
         check_disk_space()
         temp_dir = tempfile.mkdtemp(prefix="ytdl_")
-        dl_id = uuid.uuid4().hex[:12]
+        dl_id = secrets.token_hex(6)
         output_template = os.path.join(temp_dir, f"{dl_id}.%(ext)s")
 
-        cmd = cls._build_merged_download_cmd(
-            normalized_url, format_id, output_template,
-        )
+        error_log = _YdlErrorLog()
+        meter = _TransferMeter()
+        deadline = time.monotonic() + _DOWNLOAD_TIMEOUT_SECONDS
+        cancelled = threading.Event()
+
+        def _check_deadline(_: dict[str, Any]) -> None:
+            if cancelled.is_set() or time.monotonic() > deadline:
+                raise yt_dlp.utils.DownloadCancelled("Download timed out (1-hour limit)")
+
+        opts = cls._merged_download_opts(format_id, output_template)
+        if (tuning := cls._host_tuning(normalized_url)) is not None:
+            tuning.apply(opts)
+        opts["logger"] = error_log
+        opts["progress_hooks"] = [_check_deadline, meter.on_progress]
+        opts["postprocessor_hooks"] = [_check_deadline]
 
         logger.info(
-            f"Starting merged file download for format {format_id} from {safe_url}"
+            "Starting merged file download for format %s from %s",
+            format_id,
+            safe_url,
         )
 
         try:
-            result = subprocess.run(
-                cmd, capture_output=True, timeout=3600,
+            return_code = _download_by_deadline(
+                opts, normalized_url, deadline, cancelled, temp_dir
             )
-        except subprocess.TimeoutExpired:
+        except yt_dlp.utils.DownloadCancelled:
             shutil.rmtree(temp_dir, ignore_errors=True)
             raise YtdlpFailedError("Download timed out (1-hour limit)") from None
+        except yt_dlp.utils.DownloadError:
+            return_code = 1
 
-        if result.returncode != 0:
-            stderr_text = result.stderr.decode(errors="replace")
+        if return_code != 0:
+            error_text = error_log.text()
             shutil.rmtree(temp_dir, ignore_errors=True)
             logger.error(
-                f"Merged download failed ({result.returncode}) "
-                f"for {safe_url}: {stderr_text[:500]}"
+                "Merged download failed (%s) for %s: %s",
+                return_code,
+                safe_url,
+                error_text[:500],
             )
-            raise YtdlpFailedError(f"Download failed: {stderr_text[:200]}")
+            raise YtdlpFailedError(f"Download failed: {error_text[:200]}")
 
         # Find the output file (extension may vary)
-        files = [f for f in os.listdir(temp_dir) if not f.startswith(".")]
-        if not files:
+        output = _largest_output(temp_dir)
+        if output is None:
             shutil.rmtree(temp_dir, ignore_errors=True)
             raise YtdlpFailedError("Download produced no output file")
 
-        actual_path = os.path.join(temp_dir, files[0])
-        file_size = os.path.getsize(actual_path)
+        actual_path, file_size = output
+        cls._record_throughput(normalized_url, file_size, meter)
         logger.info(
-            f"Merged download complete: {file_size:,} bytes for {safe_url}"
+            "Merged download complete: %d bytes for %s", file_size, safe_url
         )
         return actual_path, temp_dir
 
+    @classmethod
+    def download_merged_multi_quality(
+        cls,
+        url: str,
+        heights: list[int],
+    ) -> tuple[dict[int, str], str]:
+        """Download once at the highest of *heights* and derive the rest.
+
+        The best merged stream is fetched with :meth:`download_merged_to_file`;
+        every lower height is then scaled from that file by a single ffmpeg
+        run with one output per height, so the source is decoded once
+        instead of once per quality.
+
+        Args:
+            url: Video URL
+            heights: Target heights in pixels (e.g. ``[1080, 720, 480]``)
+
+        Returns:
+            Tuple of (``{height: output_path}``, temp_dir_path).  The caller
+            MUST clean up *temp_dir_path*.
+
+        Raises:
+            InvalidUrlError: If URL or a height is invalid
+            YtdlpFailedError: If the download or the ffmpeg pass fails
+        """
+        targets = sorted(set(heights), reverse=True)
+        if not targets or targets[-1] <= 0:
+            raise InvalidUrlError("Invalid target heights")
+
+        top = targets[0]
+        best_path, temp_dir = cls.download_merged_to_file(
+            url, cls._merged_height_selector(top)
+        )
+        outputs = {top: best_path}
+        if len(targets) == 1:
+            return outputs, temp_dir
+
+        stem = os.path.splitext(best_path)[0]
+        cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", best_path]
+        for height in targets[1:]:
+            out_path = f"{stem}_{height}p.mp4"
+            outputs[height] = out_path
+            cmd.extend([
+                "-map", "0:v:0",
+                "-map", "0:a:0?",
+                "-vf", f"scale=-2:{height}",
+                "-c:v", "libx264",
+                "-preset", "veryfast",
+                "-c:a", "copy",
+                "-movflags", "+faststart",
+                out_path,
+            ])
+
+        logger.info("Deriving %s lower qualities in one ffmpeg pass", len(targets) - 1)
+        try:
+            result = subprocess.run(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                timeout=_DOWNLOAD_TIMEOUT_SECONDS,
+            )
+        except subprocess.TimeoutExpired:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise YtdlpFailedError("Transcode timed out (1-hour limit)") from None
+
+        if result.returncode != 0:
+            stderr_text = result.stderr.decode(errors="replace")
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            logger.error("Multi-quality transcode failed: %s", stderr_text[:500])
+            raise YtdlpFailedError("Transcode failed")
+
+        return outputs, temp_dir
+
     @classmethod
     def download_merged_with_progress(
         cls,
@@ -760,9 +1454,9 @@ class YtDlpService:
     ) -> None:
         """Download merged format with real-time progress tracking.
 
-        Uses ``subprocess.Popen`` so stderr can be read line-by-line while
-        yt-dlp runs, parsing ``[download]`` progress lines in a reader
-        thread and updating *task* fields in place.
+        Runs yt-dlp in-process (on a helper thread the caller waits on for
+        at most ``_DOWNLOAD_TIMEOUT_SECONDS``) and updates *task* fields
+        from its progress and postprocessor hooks.
 
         On success the task will have ``status="completed"`` with
         ``file_path`` / ``temp_dir`` populated.  On failure ``status``
@@ -774,197 +1468,154 @@ class YtDlpService:
             task: A :class:`~app.services.download_tasks.DownloadTask`
                   whose attributes are mutated as progress arrives.
         """
-        if not FORMAT_ID_PATTERN.match(format_id):
-            task.status = "failed"
+        if not cls.is_valid_format_id(format_id):
             task.error = "Invalid format_id"
+            task.set_status("failed")
             return
 
         normalized_url = cls.normalize_url(url)
-        safe_url = cls._sanitize_url_for_logging(normalized_url)
+        safe_url = _LazySafeUrl(normalized_url)
 
         check_disk_space()
         temp_dir = tempfile.mkdtemp(prefix="ytdl_")
-        dl_id = uuid.uuid4().hex[:12]
+        dl_id = secrets.token_hex(6)
         output_template = os.path.join(temp_dir, f"{dl_id}.%(ext)s")
         is_two_stream = "+" in format_id
 
-        cmd: list[str] = [
-            "yt-dlp",
-            "-f", format_id,
-            "-o", output_template,
-            "--merge-output-format", "mp4",
-            "--no-part",
-            "--newline",       # one line per progress update
-            "--progress",      # force progress even when not a TTY
-            "--no-playlist",
-            "--remote-components", "ejs:github",
-            "--concurrent-fragments", str(settings.YTDLP_CONCURRENT_FRAGMENTS),
-            "--throttled-rate", settings.YTDLP_THROTTLED_RATE,
-            "--buffer-size", settings.YTDLP_BUFFER_SIZE,
-            "--socket-timeout", str(settings.YTDLP_SOCKET_TIMEOUT),
-            "--retries", str(settings.YTDLP_RETRIES),
-            "--fragment-retries", str(settings.YTDLP_FRAGMENT_RETRIES),
-            "--extractor-retries", str(settings.YTDLP_EXTRACTOR_RETRIES),
-            "--file-access-retries", str(settings.YTDLP_FILE_ACCESS_RETRIES),
-        ]
-        append_youtube_extractor_cli(cmd)
-
-        if settings.YTDLP_SLEEP_REQUESTS > 0:
-            cmd.extend(["--sleep-requests", str(settings.YTDLP_SLEEP_REQUESTS)])
-        if settings.YTDLP_USER_AGENT:
-            cmd.extend(["--user-agent", settings.YTDLP_USER_AGENT])
-        if settings.YTDLP_HTTP_CHUNK_SIZE:
-            cmd.extend(["--http-chunk-size", settings.YTDLP_HTTP_CHUNK_SIZE])
-        if settings.YTDLP_SPONSORBLOCK_REMOVE:
-            cmd.extend(["--sponsorblock-remove", settings.YTDLP_SPONSORBLOCK_REMOVE])
-        if settings.YTDLP_COOKIES_FILE:
-            cmd.extend(["--cookies", settings.YTDLP_COOKIES_FILE])
-        elif settings.YTDLP_COOKIES_FROM_BROWSER:
-            cmd.extend(["--cookies-from-browser", settings.YTDLP_COOKIES_FROM_BROWSER])
-        if settings.YTDLP_PROXY:
-            cmd.extend(["--proxy", settings.YTDLP_PROXY])
-
-        cmd.append(normalized_url)
-
-        task.status = "downloading"
+        task.set_status("downloading")
         task.phase = "video" if is_two_stream else ""
 
         logger.info(
-            f"Starting progress-tracked download for {format_id} from {safe_url}"
-        )
-
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.DEVNULL,
-            text=True,
-            bufsize=1,
-            env={**os.environ, "PYTHONUNBUFFERED": "1"},
+            "Starting progress-tracked download for %s from %s",
+            format_id,
+            safe_url,
         )
 
-        stream_index = -1  # bumped on each [download] Destination: line
-
-        def _read_stdout() -> None:
-            """Background thread: parse yt-dlp stdout for progress."""
-            nonlocal stream_index
-            if process.stdout is None:
+        deadline = time.monotonic() + _DOWNLOAD_TIMEOUT_SECONDS
+        cancelled = threading.Event()
+        meter = _TransferMeter()
+        stream_index = -1  # bumped whenever the hook reports a new file
+        current_file: str | None = None
+        finished_bytes = 0  # size of streams that already completed
+        progress = 0.0
+        downloaded = total = 0
+        speed = eta = ""
+        last_pub = 0.0
+
+        def _on_progress(d: dict[str, Any]) -> None:
+            """yt-dlp progress hook: fold each update into *task*.
+
+            Fields are kept in locals and published at most every
+            ``_PROGRESS_PUBLISH_INTERVAL`` seconds; stream switches and
+            finished streams are always published.
+            """
+            nonlocal stream_index, current_file, finished_bytes
+            nonlocal progress, downloaded, total, speed, eta, last_pub
+            now = time.monotonic()
+            if cancelled.is_set() or now > deadline:
+                raise yt_dlp.utils.DownloadCancelled("Download timed out (1-hour limit)")
+
+            # Stream switch
+            filename = d.get("filename")
+            if filename != current_file:
+                current_file = filename
+                finished_bytes = total
+                stream_index += 1
+                if is_two_stream:
+                    task.phase = "video" if stream_index == 0 else "audio"
+                speed = eta = ""
+                task.publish_progress(progress, downloaded, total, speed, eta)
+                last_pub = now
+
+            status = d.get("status")
+            if status not in ("downloading", "finished"):
                 return
-            try:
-                # Use readline() instead of ``for line in ...`` to avoid
-                # Python's read-ahead buffer which delays progress updates.
-                while True:
-                    line = process.stdout.readline()
-                    if not line:
-                        break
-                    line = line.strip()
-                    if not line:
-                        continue
-
-                    # Stream switch
-                    if DESTINATION_RE.search(line):
-                        stream_index += 1
-                        if is_two_stream:
-                            task.phase = "video" if stream_index == 0 else "audio"
-                        task.speed = ""
-                        task.eta = ""
-                        continue
-
-                    # Merge phase
-                    if MERGER_RE.search(line):
-                        task.status = "merging"
-                        task.phase = "merge"
-                        task.progress = 92.0
-                        task.speed = ""
-                        task.eta = ""
-                        continue
-
-                    # Download progress percentage
-                    pct_m = PROGRESS_PCT_RE.search(line)
-                    if pct_m:
-                        raw = float(pct_m.group(1))
-                        if is_two_stream:
-                            if stream_index <= 0:
-                                task.progress = raw * 0.65
-                            else:
-                                task.progress = 65.0 + raw * 0.25
-                        else:
-                            task.progress = raw * 0.90
-                        task.progress = min(task.progress, 91.0)
-
-                        # Parse total size (e.g. "of 422.93KiB")
-                        size_m = SIZE_OF_RE.search(line)
-                        if size_m:
-                            stream_bytes = parse_size_bytes(
-                                size_m.group(1), size_m.group(2)
-                            )
-                            if is_two_stream:
-                                # Accumulate: first stream adds to base
-                                if stream_index <= 0:
-                                    task.total_bytes = stream_bytes
-                                elif stream_bytes > 0:
-                                    # Video already counted; add audio
-                                    # (only update once when audio starts)
-                                    base = task.total_bytes
-                                    if base < stream_bytes * 5:
-                                        task.total_bytes = base + stream_bytes
-                            else:
-                                task.total_bytes = stream_bytes
-                            task.downloaded_bytes = int(
-                                task.total_bytes * task.progress / 100.0
-                            )
-
-                        spd_m = SPEED_RE.search(line)
-                        if spd_m:
-                            task.speed = spd_m.group(1)
-                        eta_m = ETA_RE.search(line)
-                        if eta_m:
-                            task.eta = eta_m.group(1)
-            except Exception:
-                pass  # best-effort; don't crash on parse errors
-
-        reader = threading.Thread(target=_read_stdout, daemon=True)
-        reader.start()
+            stream_total = int(d.get("total_bytes") or d.get("total_bytes_estimate") or 0)
+            stream_done = int(d.get("downloaded_bytes") or 0)
+            if status == "finished":
+                raw = 100.0
+            elif stream_total:
+                raw = stream_done * 100.0 / stream_total
+            else:
+                raw = 0.0
+            if is_two_stream:
+                if stream_index <= 0:
+                    progress = raw * 0.65
+                else:
+                    progress = 65.0 + raw * 0.25
+            else:
+                progress = raw * 0.90
+            progress = min(progress, 91.0)
+            total = finished_bytes + stream_total
+            downloaded = finished_bytes + stream_done
+
+            if d.get("speed") is not None:
+                speed = FileDownloader.format_speed(d["speed"]).strip()
+            if d.get("eta") is not None:
+                eta = FileDownloader.format_eta(d["eta"]).strip()
+
+            if status == "finished" or now - last_pub >= _PROGRESS_PUBLISH_INTERVAL:
+                task.publish_progress(progress, downloaded, total, speed, eta)
+                last_pub = now
+
+        def _on_postprocess(d: dict[str, Any]) -> None:
+            """yt-dlp postprocessor hook: flag the ffmpeg merge step."""
+            nonlocal progress, speed, eta
+            if cancelled.is_set() or time.monotonic() > deadline:
+                raise yt_dlp.utils.DownloadCancelled("Download timed out (1-hour limit)")
+            if d.get("postprocessor") == "Merger" and d.get("status") == "started":
+                task.phase = "merge"
+                progress = 92.0
+                speed = eta = ""
+                task.publish_progress(progress, downloaded, total, speed, eta)
+                task.set_status("merging")
+
+        opts = cls._merged_download_opts(format_id, output_template)
+        if (tuning := cls._host_tuning(normalized_url)) is not None:
+            tuning.apply(opts)
+        opts["logger"] = _YdlErrorLog()
+        opts["progress_hooks"] = [_on_progress, meter.on_progress]
+        opts["postprocessor_hooks"] = [_on_postprocess]
 
         try:
-            return_code = process.wait(timeout=3600)
-        except subprocess.TimeoutExpired:
-            process.kill()
+            return_code = _download_by_deadline(
+                opts, normalized_url, deadline, cancelled, temp_dir
+            )
+        except yt_dlp.utils.DownloadCancelled:
             shutil.rmtree(temp_dir, ignore_errors=True)
-            task.status = "failed"
             task.error = "Download timed out (1-hour limit)"
+            task.set_status("failed")
             return
-
-        reader.join(timeout=5)
+        except yt_dlp.utils.DownloadError:
+            return_code = 1
 
         if return_code != 0:
             shutil.rmtree(temp_dir, ignore_errors=True)
-            task.status = "failed"
             task.error = "Download failed"
+            task.set_status("failed")
             logger.error(
-                f"Progress download failed ({return_code}) for {safe_url}"
+                "Progress download failed (%s) for %s",
+                return_code,
+                safe_url,
             )
             return
 
-        # Find output file — pick the largest to avoid accidentally selecting
-        # a leftover .part file, thumbnail, or subtitle sidecar.
-        files = [f for f in os.listdir(temp_dir) if not f.startswith(".")]
-        if not files:
+        output = _largest_output(temp_dir)
+        if output is None:
             shutil.rmtree(temp_dir, ignore_errors=True)
-            task.status = "failed"
             task.error = "Download produced no output"
+            task.set_status("failed")
             return
 
-        paths = [os.path.join(temp_dir, f) for f in files]
-        actual_path = max(paths, key=os.path.getsize)
-        task.file_path = actual_path
+        task.file_path, task.file_size = output
         task.temp_dir = temp_dir
-        task.file_size = os.path.getsize(actual_path)
+        cls._record_throughput(normalized_url, task.file_size, meter)
         task.progress = 100.0
-        task.status = "completed"
         task.speed = ""
         task.eta = ""
+        task.set_status("completed")
         logger.info(
-            f"Progress download complete: {task.file_size:,} bytes for {safe_url}"
+            "Progress download complete: %d bytes for %s", task.file_size, safe_url
         )
 
     @classmethod
@@ -987,17 +1638,17 @@ class YtDlpService:
             task: A :class:`~app.services.download_tasks.DownloadTask`
                   whose attributes are mutated as progress arrives.
         """
-        if not FORMAT_ID_PATTERN.match(format_id):
-            task.status = "failed"
+        if not cls.is_valid_format_id(format_id):
             task.error = "Invalid format_id"
+            task.set_status("failed")
             return
 
         normalized_url = cls.normalize_url(url)
-        safe_url = cls._sanitize_url_for_logging(normalized_url)
+        safe_url = _LazySafeUrl(normalized_url)
 
         check_disk_space()
         temp_dir = tempfile.mkdtemp(prefix="ytdl_single_")
-        dl_id = uuid.uuid4().hex[:12]
+        dl_id = secrets.token_hex(6)
         output_template = os.path.join(temp_dir, f"{dl_id}.%(ext)s")
 
         cmd: list[str] = [
@@ -1006,144 +1657,173 @@ class YtDlpService:
             "-o", output_template,
             "--no-part",
             "--newline",
-            "--progress",
-            "--no-playlist",
-            "--remote-components", "ejs:github",
-            "--concurrent-fragments", str(settings.YTDLP_CONCURRENT_FRAGMENTS),
-            "--throttled-rate", settings.YTDLP_THROTTLED_RATE,
-            "--buffer-size", settings.YTDLP_BUFFER_SIZE,
-            "--socket-timeout", str(settings.YTDLP_SOCKET_TIMEOUT),
-            "--retries", str(settings.YTDLP_RETRIES),
-            "--fragment-retries", str(settings.YTDLP_FRAGMENT_RETRIES),
-            "--extractor-retries", str(settings.YTDLP_EXTRACTOR_RETRIES),
-            "--file-access-retries", str(settings.YTDLP_FILE_ACCESS_RETRIES),
+            "--progress-template", PROGRESS_TEMPLATE,
+            *cls._shared_download_args(),
         ]
-        append_youtube_extractor_cli(cmd)
+        if (tuning := cls._host_tuning(normalized_url)) is not None:
+            cmd.extend(tuning.cli_args())
 
-        if settings.YTDLP_SLEEP_REQUESTS > 0:
-            cmd.extend(["--sleep-requests", str(settings.YTDLP_SLEEP_REQUESTS)])
-        if settings.YTDLP_USER_AGENT:
-            cmd.extend(["--user-agent", settings.YTDLP_USER_AGENT])
-        if settings.YTDLP_HTTP_CHUNK_SIZE:
-            cmd.extend(["--http-chunk-size", settings.YTDLP_HTTP_CHUNK_SIZE])
-        if settings.YTDLP_SPONSORBLOCK_REMOVE:
-            cmd.extend(["--sponsorblock-remove", settings.YTDLP_SPONSORBLOCK_REMOVE])
-        if settings.YTDLP_COOKIES_FILE:
-            cmd.extend(["--cookies", settings.YTDLP_COOKIES_FILE])
-        elif settings.YTDLP_COOKIES_FROM_BROWSER:
-            cmd.extend(["--cookies-from-browser", settings.YTDLP_COOKIES_FROM_BROWSER])
-        if settings.YTDLP_PROXY:
-            cmd.extend(["--proxy", settings.YTDLP_PROXY])
-
-        cmd.append(normalized_url)
+        # Reuse the extraction from fetch_formats when it is still cached
+        info_json = cls.get_cached_info_json(normalized_url)
+        if info_json is not None:
+            cmd.extend(["--load-info-json", "-"])
+        else:
+            cmd.append(normalized_url)
 
-        task.status = "downloading"
+        task.set_status("downloading")
         task.phase = ""
 
         logger.info(
-            f"Starting progress-tracked single-stream download for {format_id} "
-            f"from {safe_url}"
+            "Starting progress-tracked single-stream download for %s from %s",
+            format_id,
+            safe_url,
         )
 
+        progress = 0.0
+        downloaded = total = 0
+        speed = eta = ""
+        last_pub = 0.0
+        pending = False
+        meter = _TransferMeter()
+
+        def _on_stdout_line(line: bytes) -> None:
+            """Reactor callback: decode one yt-dlp JSON progress line.
+
+            Each update is one ``PROGRESS_TEMPLATE`` object; other stdout
+            lines are skipped.  Publishes to the task at most every
+            ``_PROGRESS_PUBLISH_INTERVAL`` seconds; the last decoded line
+            is flushed once the process exits.
+            """
+            nonlocal progress, downloaded, total, speed, eta, last_pub, pending
+            if not line.startswith(b"{"):
+                return
+            try:
+                d = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                return
+            now = time.monotonic()
+            meter.tick(now, d["u"])
+
+            total = int(d["t"] or d["e"] or total)
+            downloaded = int(d["d"] or downloaded)
+            if d["p"] is not None:
+                progress = min(float(d["p"]), 99.0)
+            elif total:
+                progress = min(downloaded * 100.0 / total, 99.0)
+            if d["s"] is not None:
+                speed = FileDownloader.format_speed(d["s"]).strip()
+            if d["eta"] is not None:
+                eta = FileDownloader.format_eta(d["eta"]).strip()
+
+            if now - last_pub >= _PROGRESS_PUBLISH_INTERVAL:
+                task.publish_progress(progress, downloaded, total, speed, eta)
+                last_pub = now
+                pending = False
+            else:
+                pending = True
+
         process = subprocess.Popen(
             cmd,
+            stdin=subprocess.PIPE if info_json is not None else None,
             stdout=subprocess.PIPE,
-            stderr=subprocess.DEVNULL,
-            text=True,
-            bufsize=1,
+            stderr=subprocess.PIPE,
+            bufsize=_PIPE_BUFSIZE,
             env={**os.environ, "PYTHONUNBUFFERED": "1"},
         )
+        # Both output pipes are read by the shared reactor thread, and are
+        # registered before feeding stdin so the child can't block on them
+        reactor = get_pipe_reactor()
+        stderr_tail: deque[bytes] = deque(maxlen=_STDERR_TAIL_LINES)
+        stdout_done = reactor.watch(
+            cast(IO[bytes], process.stdout).fileno(), _on_stdout_line
+        )
+        stderr_done = reactor.watch(
+            cast(IO[bytes], process.stderr).fileno(), stderr_tail.append
+        )
 
-        def _read_stdout() -> None:
-            """Background thread: parse yt-dlp stdout for progress."""
-            if process.stdout is None:
-                return
-            try:
-                while True:
-                    line = process.stdout.readline()
-                    if not line:
-                        break
-                    line = line.strip()
-                    if not line:
-                        continue
-
-                    # Download progress percentage
-                    pct_m = PROGRESS_PCT_RE.search(line)
-                    if pct_m:
-                        raw = float(pct_m.group(1))
-                        task.progress = min(raw, 99.0)
-
-                        size_m = SIZE_OF_RE.search(line)
-                        if size_m:
-                            task.total_bytes = parse_size_bytes(
-                                size_m.group(1), size_m.group(2)
-                            )
-                            task.downloaded_bytes = int(
-                                task.total_bytes * task.progress / 100.0
-                            )
-
-                        spd_m = SPEED_RE.search(line)
-                        if spd_m:
-                            task.speed = spd_m.group(1)
-                        eta_m = ETA_RE.search(line)
-                        if eta_m:
-                            task.eta = eta_m.group(1)
-            except Exception:
-                pass
-
-        reader = threading.Thread(target=_read_stdout, daemon=True)
-        reader.start()
+        if info_json is not None and process.stdin is not None:
+            # A child that dies early is reported through its return code
+            with contextlib.suppress(BrokenPipeError):
+                process.stdin.write(info_json)
+            with contextlib.suppress(BrokenPipeError):
+                process.stdin.close()
 
+        return_code: int | None = None
         try:
             return_code = process.wait(timeout=3600)
+            stdout_done.wait(timeout=5)
+            stderr_done.wait(timeout=5)
         except subprocess.TimeoutExpired:
             process.kill()
+            process.wait()
+        finally:
+            # Release both fds before the pipes close, even if EOF never
+            # came (e.g. a grandchild still holds them), so the reactor
+            # can't be left with a registration for a reused fd number
+            for pipe in (process.stdout, process.stderr):
+                if pipe is not None:
+                    reactor.unwatch(pipe.fileno())
+                    pipe.close()
+
+        if return_code is None:
             shutil.rmtree(temp_dir, ignore_errors=True)
-            task.status = "failed"
             task.error = "Download timed out (1-hour limit)"
+            task.set_status("failed")
             return
 
-        reader.join(timeout=5)
+        if pending:
+            task.publish_progress(progress, downloaded, total, speed, eta)
 
         if return_code != 0:
             shutil.rmtree(temp_dir, ignore_errors=True)
-            task.status = "failed"
             task.error = "Download failed"
+            task.set_status("failed")
             logger.error(
-                f"Single-stream download failed ({return_code}) for {safe_url}"
+                "Single-stream download failed (%s) for %s: %s",
+                return_code,
+                safe_url,
+                b"\n".join(stderr_tail).decode(errors="replace")[-500:],
             )
             return
 
-        files = [f for f in os.listdir(temp_dir) if not f.startswith(".")]
-        if not files:
+        output = _largest_output(temp_dir)
+        if output is None:
             shutil.rmtree(temp_dir, ignore_errors=True)
-            task.status = "failed"
             task.error = "Download produced no output"
+            task.set_status("failed")
             return
 
-        paths = [os.path.join(temp_dir, f) for f in files]
-        actual_path = max(paths, key=os.path.getsize)
-        task.file_path = actual_path
+        task.file_path, task.file_size = output
         task.temp_dir = temp_dir
-        task.file_size = os.path.getsize(actual_path)
+        cls._record_throughput(normalized_url, task.file_size, meter)
         task.progress = 100.0
-        task.status = "completed"
         task.speed = ""
         task.eta = ""
+        task.set_status("completed")
         logger.info(
-            f"Single-stream download complete: {task.file_size:,} bytes "
-            f"for {safe_url}"
+            "Single-stream download complete: %d bytes for %s",
+            task.file_size,
+            safe_url,
         )
 
     @classmethod
-    def download_format(
+    async def download_format(
         cls,
         url: str,
         format_id: str,
         progress_callback: Callable[[dict[str, Any]], None] | None = None,
-    ) -> subprocess.Popen[bytes]:
+    ) -> asyncio.subprocess.Process:
         """Start streaming download of a specific format.
 
+        The child is an asyncio subprocess, so callers read
+        ``process.stdout`` directly on the event loop and drain
+        ``process.stderr`` in a concurrent task rather than dedicating an
+        OS thread to each pipe.  Each stream reader buffers at most
+        ~2x ``YTDLP_PIPE_READ_SIZE`` before pausing the pipe, so a
+        stalled HTTP client back-pressures yt-dlp instead of growing memory.
+        Without *progress_callback* nothing reads stderr, so it goes to
+        ``DEVNULL`` and ``process.stderr`` is ``None``.
+
         Args:
             url: Video URL
             format_id: Format ID to download
@@ -1157,28 +1837,47 @@ class YtDlpService:
             YtdlpFailedError: If download fails to start
         """
         # Validate format_id to prevent command injection
-        if not FORMAT_ID_PATTERN.match(format_id):
+        if not cls.is_valid_format_id(format_id):
             raise InvalidUrlError("Invalid format_id")
 
-        cmd = cls.build_download_command(
-            url=url, format_id=format_id, progress=bool(progress_callback),
+        normalized_url = cls.normalize_url(url)
+        safe_url = _LazySafeUrl(normalized_url)
+
+        # Reuse the extraction from fetch_formats when it is still cached
+        entry = await cls.get_cached_entry_async(normalized_url)
+        info_json = entry.info_json if entry is not None else None
+        cmd = cls._build_single_download_cmd(
+            normalized_url,
+            format_id,
+            progress=bool(progress_callback),
+            info_json=info_json is not None,
         )
-        safe_url = cls._sanitize_url_for_logging(cls.normalize_url(url))
-        logger.info(f"Starting download for format {format_id} from {safe_url}")
+        logger.info("Starting download for format %s from %s", format_id, safe_url)
 
         try:
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE if info_json is not None else None,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=(
+                    asyncio.subprocess.PIPE
+                    if progress_callback
+                    else asyncio.subprocess.DEVNULL
+                ),
+                limit=_PIPE_BUFFER_LIMIT,
                 start_new_session=True,  # Prevent signal propagation
             )
-            return process
 
         except Exception as e:
-            logger.error(f"Failed to start download process for {safe_url}: {e}")
+            logger.error("Failed to start download process for %s: %s", safe_url, e)
             raise YtdlpFailedError(f"Failed to start download: {e}") from e
 
+        if info_json is not None and process.stdin is not None:
+            # Buffered by the transport and flushed before the pipe closes
+            process.stdin.write(info_json)
+            process.stdin.close()
+        return process
+
     @classmethod
     def build_download_command(
         cls,
@@ -1187,76 +1886,110 @@ class YtDlpService:
         progress: bool = False,
         *,
         output_file: str | None = None,
+        info_json: bool = False,
     ) -> list[str]:
         """Build a yt-dlp command for a single-stream format.
 
         With *output_file* ``None``, streams to stdout (``-o -``). Otherwise
-        writes to *output_file*.
+        writes to *output_file*.  With *info_json*, the child reads a cached
+        info dict from stdin (``--load-info-json -``) instead of extracting
+        the URL again.
 
         For merged formats (video+audio), use ``download_merged_to_file`` or
         ``_build_merged_download_cmd`` — piping merged output to stdout
         produces MPEG-TS, not MP4.
         """
-        normalized_url = cls.normalize_url(url)
-
-        format_spec = format_id
+        return cls._build_single_download_cmd(
+            cls.normalize_url(url),
+            format_id,
+            progress,
+            output_file=output_file,
+            info_json=info_json,
+        )
 
+    @classmethod
+    def _build_single_download_cmd(
+        cls,
+        normalized_url: str,
+        format_id: str,
+        progress: bool = False,
+        *,
+        output_file: str | None = None,
+        info_json: bool = False,
+    ) -> list[str]:
+        """:meth:`build_download_command` for an already-normalized URL."""
         cmd: list[str] = [
             "yt-dlp",
-            "-f", format_spec,
-        ]
-        if output_file is None:
-            cmd.extend(["-o", "-", "-c"])
-        else:
-            cmd.extend(["-o", output_file, "-c"])
-        cmd.extend([
+            "-f", format_id,
+            "-o", "-" if output_file is None else output_file,
+            "-c",
             "--no-warnings",
             "--quiet",
-            "--no-playlist",
-            "--remote-components", "ejs:github",
-            "--concurrent-fragments", str(settings.YTDLP_CONCURRENT_FRAGMENTS),
-            "--throttled-rate", settings.YTDLP_THROTTLED_RATE,
-            "--buffer-size", settings.YTDLP_BUFFER_SIZE,
-            "--socket-timeout", str(settings.YTDLP_SOCKET_TIMEOUT),
-            "--retries", str(settings.YTDLP_RETRIES),
-            "--fragment-retries", str(settings.YTDLP_FRAGMENT_RETRIES),
-            "--extractor-retries", str(settings.YTDLP_EXTRACTOR_RETRIES),
-            "--file-access-retries", str(settings.YTDLP_FILE_ACCESS_RETRIES),
-        ])
-
-        # Network optimizations
-        if settings.YTDLP_SLEEP_REQUESTS > 0:
-            cmd.extend(["--sleep-requests", str(settings.YTDLP_SLEEP_REQUESTS)])
-
-        # User agent spoofing
-        if settings.YTDLP_USER_AGENT:
-            cmd.extend(["--user-agent", settings.YTDLP_USER_AGENT])
-
+            *cls._shared_download_args(),
+        ]
         # Prefer free formats for single-stream downloads
         if settings.YTDLP_PREFER_FREE_FORMATS:
             cmd.append("--prefer-free-formats")
 
-        if settings.YTDLP_HTTP_CHUNK_SIZE:
-            cmd.extend(["--http-chunk-size", settings.YTDLP_HTTP_CHUNK_SIZE])
-
-        # SponsorBlock: skip sponsor segments to reduce download time
-        if settings.YTDLP_SPONSORBLOCK_REMOVE:
-            cmd.extend(["--sponsorblock-remove", settings.YTDLP_SPONSORBLOCK_REMOVE])
+        if progress:
+            cmd.extend(["--newline", "--progress-template", PROGRESS_TEMPLATE])
 
-        # Cookies for authentication (file preferred over browser on servers)
-        if settings.YTDLP_COOKIES_FILE:
-            cmd.extend(["--cookies", settings.YTDLP_COOKIES_FILE])
-        elif settings.YTDLP_COOKIES_FROM_BROWSER:
-            cmd.extend(["--cookies-from-browser", settings.YTDLP_COOKIES_FROM_BROWSER])
+        if (tuning := cls._host_tuning(normalized_url)) is not None:
+            cmd.extend(tuning.cli_args())
 
-        # Proxy (can help with regional throttling)
-        if settings.YTDLP_PROXY:
-            cmd.extend(["--proxy", settings.YTDLP_PROXY])
+        if info_json:
+            cmd.extend(["--load-info-json", "-"])
+        else:
+            cmd.append(normalized_url)
+        return cmd
 
-        if progress:
-            cmd.extend(["--newline", "--progress"])
 
-        append_youtube_extractor_cli(cmd)
+@functools.lru_cache(maxsize=2048)
+def _normalize_url_memo(url: str, _block_private: bool) -> str:
+    """Memoized :meth:`YtDlpService.normalize_url`, keyed on the SSRF flag too."""
+    return YtDlpService._normalize_url_uncached(url)
+
+
+def _merged_format(
+    format_id: str, quality_label: str, *, height: int = 0, priority: int = 1
+) -> Format:
+    """Build one merged (video+audio) ``Format`` for the static tier table."""
+    fmt = Format(
+        id=format_id,
+        quality_label=quality_label,
+        mime_type="video/mp4",
+        filesize_bytes=None,
+        is_audio_only=False,
+        is_video_only=False,
+    )
+    fmt._height = height
+    fmt._priority = priority
+    return fmt
+
+
+# Best-available merged option – stay within QuickTime-compatible codecs
+# (H.264 video + AAC audio) only.  No bare "/best" fallback because it can
+# pick VP9/Opus which QuickTime cannot play.
+_BEST_MERGED_FORMAT = _merged_format(
+    "bestvideo[vcodec^=avc1]+bestaudio[acodec^=mp4a]"
+    "/bestvideo[vcodec^=avc1]+bestaudio[acodec^=mp4]"
+    "/bestvideo[vcodec^=avc]+bestaudio[acodec^=mp4a]"
+    "/best[vcodec^=avc1]"
+    "/best[vcodec^=avc]",
+    "Best Available (Merged)",
+    priority=0,
+)
 
-        cmd.append(normalized_url)
-        return cmd
+# Resolution-specific merged formats – restrict to H.264 + AAC.
+# No bare "/best[height<=N]" fallback (could yield VP9).
+_MERGED_TIER_FORMATS: tuple[tuple[int, Format], ...] = tuple(
+    (
+        height,
+        _merged_format(
+            YtDlpService._merged_height_selector(height),
+            f"{label} (Merged)",
+            height=height,
+        ),
+    )
+    for height, label, _fmt_id in MERGE_TIERS
+)
@@ -12,9 +12,41 @@ MIME_APPLICATION_PREFIX = "application/"
 
 VIDEO_CONTAINER_EXTS = {"mp4", "m4v", "mov"}
 
-BLOCKED_HOSTNAMES = {"localhost", "127.0.0.1", "0.0.0.0", "::1"}
+# Info-dict keys download children never read; subtitle tables dominate the
+# size of YouTube info JSON
+INFO_JSON_DROP_KEYS = frozenset({"automatic_captions", "subtitles", "heatmap"})
 
-FORMAT_ID_PATTERN = re.compile(r"^[a-zA-Z0-9+\[\]<>=^:/\-_.]+$")
+BLOCKED_HOSTNAMES = frozenset({"localhost", "127.0.0.1", "0.0.0.0", "::1"})
+
+# Plain scheme://hostname[/path] URLs (no userinfo, port or bracketed IPv6)
+# that normalize_url can validate without urlparse; group 1 is the scheme,
+# group 2 the hostname.
+SIMPLE_URL_RE = re.compile(r"(https?)://([a-z0-9.\-]{1,253})(?:/\S*)?", re.IGNORECASE)
+# Hostnames made only of these characters may be IPv4 literals
+IPV4_CHARS = frozenset("0123456789.")
+
+# Characters allowed in a format_id; translate() with the delete table
+# leaves an empty string exactly when every character is allowed.
+FORMAT_ID_CHARS = frozenset(
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789+[]<>=^:/-_."
+)
+FORMAT_ID_DELETE_TABLE = str.maketrans("", "", "".join(sorted(FORMAT_ID_CHARS)))
+
+# Format selectors that make yt-dlp merge video+audio (see is_merged_format)
+MERGED_FORMAT_IDS = frozenset({"best", "bestvideo"})
+MERGED_FORMAT_PREFIXES = ("best[", "bestvideo[")
+
+# H.264 + AAC merge selector for a height cap, pre-split around the height
+# so each tier is built with a single str.join.
+MERGED_HEIGHT_SELECTOR_PARTS: tuple[str, ...] = tuple(
+    (
+        "bestvideo[height<={h}][vcodec^=avc1]+bestaudio[acodec^=mp4a]"
+        "/bestvideo[height<={h}][vcodec^=avc1]+bestaudio[acodec^=mp4]"
+        "/bestvideo[height<={h}][vcodec^=avc]+bestaudio[acodec^=mp4a]"
+        "/best[height<={h}][vcodec^=avc1]"
+        "/best[height<={h}][vcodec^=avc]"
+    ).split("{h}")
+)
 
 MERGE_TIERS: list[tuple[int, str, str]] = [
     (2160, "4K Ultra HD (2160p)", "merged-2160"),
@@ -24,9 +56,15 @@ MERGE_TIERS: list[tuple[int, str, str]] = [
     (480, "SD (480p)", "merged-480"),
 ]
 
-PROGRESS_PCT_RE = re.compile(r"\[download\]\s+([\d.]+)%")
-SIZE_OF_RE = re.compile(r"of\s+~?([\d.]+)\s*(\S+)")
-SPEED_RE = re.compile(r"at\s+([\d.]+\s*\S+/s)")
-ETA_RE = re.compile(r"ETA\s+(\S+)")
-DESTINATION_RE = re.compile(r"\[download\]\s+Destination:")
-MERGER_RE = re.compile(r"\[Merger\]")
+# yt-dlp --progress-template emitting one compact JSON object per update;
+# fields yt-dlp has not computed yet come through as null.  "u" is the
+# media URL being fetched, so throughput is credited to the serving host.
+PROGRESS_TEMPLATE = (
+    'download:{"p":%(progress._percent|null)j,'
+    '"d":%(progress.downloaded_bytes|null)j,'
+    '"t":%(progress.total_bytes|null)j,'
+    '"e":%(progress.total_bytes_estimate|null)j,'
+    '"s":%(progress.speed|null)j,'
+    '"eta":%(progress.eta|null)j,'
+    '"u":%(info.url|null)j}'
+)
@@ -0,0 +1,90 @@
+"""SQLite-backed second-level cache for formats payloads."""
+
+import sqlite3
+import threading
+import time
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS formats (
+    url TEXT PRIMARY KEY,
+    payload BLOB NOT NULL,
+    stored_at REAL NOT NULL
+)
+"""
+
+# Drop the oldest rows once the newest-first running total passes the budget
+_TRIM_SQL = """
+DELETE FROM formats WHERE url IN (
+    SELECT url FROM (
+        SELECT url, SUM(LENGTH(payload)) OVER (ORDER BY stored_at DESC) AS running
+        FROM formats
+    ) WHERE running > ?
+)
+"""
+
+
+class FormatsDiskCache:
+    """Persistent ``normalized URL -> VideoInfo JSON`` store.
+
+    Entries use wall-clock timestamps so they stay valid across restarts.
+    Storage errors are logged and reported as misses; the cache is never
+    allowed to fail a request.
+    """
+
+    def __init__(self, path: str, ttl_seconds: int, max_bytes: int) -> None:
+        self._ttl = ttl_seconds
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+
+    def get(self, url: str) -> bytes | None:
+        """Return the stored payload for *url* if it has not expired."""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT payload, stored_at FROM formats WHERE url = ?", (url,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if time.time() - row[1] > self._ttl:
+                    self._conn.execute("DELETE FROM formats WHERE url = ?", (url,))
+                    return None
+        except sqlite3.Error as e:
+            logger.warning("Formats disk cache read failed: %s", e)
+            return None
+        return bytes(row[0])
+
+    def set(self, url: str, payload: bytes) -> None:
+        """Store *payload* for *url*, then trim to the configured byte budget."""
+        try:
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO formats (url, payload, stored_at) "
+                    "VALUES (?, ?, ?)",
+                    (url, payload, time.time()),
+                )
+                self._conn.execute(_TRIM_SQL, (self._max_bytes,))
+        except sqlite3.Error as e:
+            logger.warning("Formats disk cache write failed: %s", e)
+
+    def clear(self) -> None:
+        """Delete every stored entry."""
+        try:
+            with self._lock:
+                self._conn.execute("DELETE FROM formats")
+        except sqlite3.Error as e:
+            logger.warning("Formats disk cache clear failed: %s", e)
+
+    def close(self) -> None:
+        """Close the underlying connection."""
+        with self._lock:
+            self._conn.close()
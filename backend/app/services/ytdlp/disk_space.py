@@ -6,26 +6,33 @@ from typing import Final
 
 from app.services.errors import YtdlpFailedError
 
-_SIZE_UNITS: Final[dict[str, float]] = {
-    "B": 1,
-    "KiB": 1024,
-    "MiB": 1024**2,
-    "GiB": 1024**3,
-    "KB": 1000,
-    "MB": 1000**2,
-    "GB": 1000**3,
-    "kB": 1000,
-    "k": 1000,
-}
+# Unit prefixes yt-dlp prints; the position is the power of 1024 (binary
+# "KiB"/"MiB"/"GiB") or of 1000 (decimal "KB"/"kB"/"MB"/"GB"/"k").
+_UNIT_PREFIXES: Final = "_KMG"
+_DECIMAL_SCALES: Final = (1, 1000, 1000**2, 1000**3)
 
 _MIN_FREE_DISK_BYTES = 500 * 1024 * 1024
 
 
 def parse_size_bytes(value: str, unit: str) -> int:
-    """Convert a size string like '422.93' + 'KiB' to integer bytes."""
-    multiplier = _SIZE_UNITS.get(unit, 1)
+    """Convert a size string like '422.93' + 'KiB' to integer bytes.
+
+    Units are decoded from their shape instead of a table lookup: binary
+    units scale by a shift, decimal ones by a power of 1000, and anything
+    unrecognised counts as plain bytes.
+    """
     try:
-        return int(float(value) * multiplier)
+        number = float(value)
+        lead = unit[:1]
+        if len(unit) == 3 and unit[1:] == "iB":
+            index = _UNIT_PREFIXES.find(lead)
+            if index > 0:
+                return int(number * (1 << (10 * index)))
+        elif unit[1:] == "B" or unit == "k":
+            index = _UNIT_PREFIXES.find("K" if lead == "k" else lead)
+            if index > 0:
+                return int(number * _DECIMAL_SCALES[index])
+        return int(number)
     except (ValueError, OverflowError):
         return 0
 
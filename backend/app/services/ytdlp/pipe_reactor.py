@@ -0,0 +1,178 @@
+"""One-thread line reader multiplexing the pipes of many subprocesses."""
+
+import contextlib
+import os
+import selectors
+import threading
+from collections.abc import Callable
+from typing import Final
+
+from app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+_READ_SIZE: Final = 64 * 1024
+
+# A partial line longer than this is emitted as-is rather than buffered
+_MAX_LINE_BYTES: Final = 64 * 1024
+
+
+class _Watch:
+    """Per-pipe state: the line callback, partial-line buffer and EOF flag."""
+
+    __slots__ = ("on_line", "buffer", "done")
+
+    def __init__(self, on_line: Callable[[bytes], None]) -> None:
+        self.on_line = on_line
+        self.buffer = bytearray()
+        self.done = threading.Event()
+
+    def emit(self, line: bytes) -> None:
+        try:
+            self.on_line(line)
+        except Exception:
+            logger.exception("Pipe line callback failed")
+
+
+class PipeReactor:
+    """Reads newline-delimited output from many pipes on one daemon thread.
+
+    :meth:`watch` hands a pipe fd to the reactor; ``on_line`` then runs on
+    the reactor thread for every complete line (newline stripped), so it
+    must be quick and must not block.  The returned event is set once the
+    pipe reaches EOF and every line has been delivered, or once the fd is
+    dropped via :meth:`unwatch` or after an error.  Watch and unwatch
+    requests are queued and applied by the reactor thread itself, woken
+    through a self-pipe, so the selector is only ever touched from one
+    thread.  A failure on one fd is logged and drops only that fd.
+
+    Callers must :meth:`unwatch` an fd that has not reached EOF before
+    closing it; otherwise a later pipe reusing the number would collide
+    with the stale registration.
+    """
+
+    def __init__(self) -> None:
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        # (fd, watch) to register, or (fd, ack event) to unregister
+        self._pending: list[tuple[int, _Watch | threading.Event]] = []
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector.register(self._wake_r, selectors.EVENT_READ, None)
+        threading.Thread(target=self._run, name="pipe-reactor", daemon=True).start()
+
+    def watch(self, fd: int, on_line: Callable[[bytes], None]) -> threading.Event:
+        """Deliver each line read from *fd* to *on_line* until EOF."""
+        watch = _Watch(on_line)
+        self._submit(fd, watch)
+        return watch.done
+
+    def unwatch(self, fd: int, timeout: float = 5.0) -> bool:
+        """Stop reading *fd* and wait until the reactor has released it.
+
+        Safe to call after EOF (a no-op then).  Must not be called from an
+        ``on_line`` callback.  Returns False if the reactor did not confirm
+        within *timeout*.
+        """
+        ack = threading.Event()
+        self._submit(fd, ack)
+        return ack.wait(timeout)
+
+    def _submit(self, fd: int, request: _Watch | threading.Event) -> None:
+        with self._lock:
+            self._pending.append((fd, request))
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass  # a wakeup is already queued
+
+    def _run(self) -> None:
+        while True:
+            try:
+                events = self._selector.select()
+            except Exception:
+                logger.exception("Pipe reactor select failed")
+                continue
+            for key, _ in events:
+                try:
+                    if key.data is None:
+                        self._apply_pending()
+                    else:
+                        self._read(key.fd, key.data)
+                except Exception:
+                    logger.exception("Pipe reactor failed on fd %s", key.fd)
+                    if key.data is not None:
+                        self._drop(key.fd)
+
+    def _apply_pending(self) -> None:
+        try:
+            while os.read(self._wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for fd, request in pending:
+            if isinstance(request, threading.Event):
+                self._drop(fd)
+                request.set()
+                continue
+            # A registration still present for this number belongs to a
+            # pipe that was closed without unwatch(); the fd has since been
+            # reused, so the old watch can never see EOF.
+            if self._drop(fd):
+                logger.warning("Replaced stale pipe registration for fd %s", fd)
+            try:
+                self._selector.register(fd, selectors.EVENT_READ, request)
+            except Exception as e:
+                logger.warning("Cannot watch fd %s: %s", fd, e)
+                request.done.set()
+
+    def _drop(self, fd: int) -> bool:
+        """Unregister *fd* if it is a watched pipe and release its waiter."""
+        key = self._selector.get_map().get(fd)
+        if key is None or key.data is None:
+            return False
+        with contextlib.suppress(KeyError, OSError, ValueError):
+            self._selector.unregister(fd)
+        key.data.done.set()
+        return True
+
+    def _read(self, fd: int, watch: _Watch) -> None:
+        try:
+            data = os.read(fd, _READ_SIZE)
+        except OSError:
+            data = b""
+        buf = watch.buffer
+        if not data:
+            self._selector.unregister(fd)
+            if buf:
+                watch.emit(bytes(buf))
+                buf.clear()
+            watch.done.set()
+            return
+
+        buf += data
+        start = 0
+        while (end := buf.find(b"\n", start)) >= 0:
+            watch.emit(bytes(buf[start:end]))
+            start = end + 1
+        del buf[:start]
+        if len(buf) > _MAX_LINE_BYTES:
+            watch.emit(bytes(buf))
+            buf.clear()
+
+
+_reactor: PipeReactor | None = None
+_reactor_lock = threading.Lock()
+
+
+def get_pipe_reactor() -> PipeReactor:
+    """Return the process-wide reactor, starting its thread on first use."""
+    global _reactor
+    if _reactor is None:
+        with _reactor_lock:
+            if _reactor is None:
+                _reactor = PipeReactor()
+    return _reactor
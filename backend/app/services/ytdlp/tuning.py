@@ -0,0 +1,92 @@
+"""Per-host download tuning from observed throughput."""
+
+import threading
+from typing import Any, Final, NamedTuple
+
+from app.core.config import settings
+
+# Smoothing factor for the per-host throughput average
+_EWMA_ALPHA: Final = 0.3
+
+# CDN edges come and go; keep history for at most this many hosts
+_MAX_HOSTS: Final = 1024
+
+FAST_BYTES_PER_SECOND: Final = 10 * 1024 * 1024
+SLOW_BYTES_PER_SECOND: Final = 1024 * 1024
+
+
+class DownloadTuning(NamedTuple):
+    """yt-dlp transfer options overriding the configured defaults."""
+
+    concurrent_fragments: int
+    buffer_size: int
+
+    def cli_args(self) -> list[str]:
+        """Return argv overrides; later yt-dlp flags win over earlier ones."""
+        return [
+            "--concurrent-fragments",
+            str(self.concurrent_fragments),
+            "--buffer-size",
+            str(self.buffer_size),
+        ]
+
+    def apply(self, ydl_opts: dict[str, Any]) -> None:
+        """Set the overrides on in-process ``YoutubeDL`` params."""
+        ydl_opts["concurrent_fragment_downloads"] = self.concurrent_fragments
+        ydl_opts["buffersize"] = self.buffer_size
+
+
+FAST_TUNING: Final = DownloadTuning(
+    concurrent_fragments=16, buffer_size=4 * 1024 * 1024
+)
+SLOW_TUNING: Final = DownloadTuning(concurrent_fragments=4, buffer_size=1024 * 1024)
+
+
+class ThroughputTuner:
+    """Thread-safe ``host -> EWMA bytes/s`` map that picks a tuning tier.
+
+    Rates are recorded against the media host that served the bytes (a
+    CDN edge, not the page host).  Passing *via* remembers that edge as
+    the latest one behind a page host, so :meth:`tuning_for` on the page
+    host uses that edge's history.  Hosts without history, or between the
+    slow and fast thresholds, get ``None`` so the configured settings
+    apply unchanged.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._rates: dict[str, float] = {}
+        self._routes: dict[str, str] = {}
+
+    def record(
+        self, host: str, bytes_per_second: float, *, via: str | None = None
+    ) -> None:
+        """Fold one transfer's average rate into *host*'s EWMA."""
+        if bytes_per_second <= 0:
+            return
+        with self._lock:
+            if via is not None and via != host:
+                self._routes[via] = host
+            prev = self._rates.get(host)
+            if prev is None and len(self._rates) >= _MAX_HOSTS:
+                # Dicts keep insertion order: drop the oldest host seen
+                del self._rates[next(iter(self._rates))]
+            self._rates[host] = (
+                bytes_per_second
+                if prev is None
+                else prev + _EWMA_ALPHA * (bytes_per_second - prev)
+            )
+
+    def tuning_for(self, host: str) -> DownloadTuning | None:
+        """Return overrides for *host*, or None to keep the settings."""
+        if not settings.YTDLP_ADAPTIVE_TUNING:
+            return None
+        with self._lock:
+            rate = self._rates.get(self._routes.get(host, host))
+        if rate is None:
+            return None
+        if rate >= FAST_BYTES_PER_SECOND:
+            return FAST_TUNING
+        if rate < SLOW_BYTES_PER_SECOND:
+            return SLOW_TUNING
+        return None
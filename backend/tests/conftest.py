@@ -4,7 +4,10 @@ from collections.abc import Generator
 import pytest
 from fastapi.testclient import TestClient
 
+from app.core.rate_limit import limiter
 from app.main import create_app
+from app.services.yt_dlp_service import YtDlpService, _normalize_url_memo
+from app.services.ytdlp.tuning import ThroughputTuner
 
 
 @pytest.fixture
@@ -15,5 +18,31 @@ def client() -> Generator[TestClient, None, None]:
         TestClient instance
     """
     app = create_app()
+    # The limiter is module-global; give each client fresh rate-limit windows
+    limiter.reset()
     with TestClient(app) as test_client:
         yield test_client
+
+
+@pytest.fixture(autouse=True)
+def reset_formats_cache() -> Generator[None, None, None]:
+    """Give every test an empty formats cache (and no disk cache)."""
+    YtDlpService._formats_cache = None
+    YtDlpService._disk_cache = None
+    YtDlpService._disk_cache_checked = False
+    YtDlpService._ydl_opts_base = None
+    YtDlpService._download_args_base = None
+    YtDlpService._failure_cache = None
+    YtDlpService._tuner = ThroughputTuner()
+    _normalize_url_memo.cache_clear()
+    yield
+    if YtDlpService._disk_cache is not None:
+        YtDlpService._disk_cache.close()
+    YtDlpService._formats_cache = None
+    YtDlpService._disk_cache = None
+    YtDlpService._disk_cache_checked = False
+    YtDlpService._ydl_opts_base = None
+    YtDlpService._download_args_base = None
+    YtDlpService._failure_cache = None
+    YtDlpService._tuner = ThroughputTuner()
+    _normalize_url_memo.cache_clear()
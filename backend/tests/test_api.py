@@ -1,8 +1,10 @@
 """Tests for API endpoints."""
-from unittest.mock import MagicMock, patch
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from fastapi.testclient import TestClient
 
+from app.core.config import settings
 from app.models.video import Format, VideoInfo
 
 
@@ -60,6 +62,64 @@ class TestFormatsEndpoint:
         assert len(data["formats"]) == 1
         assert data["formats"][0]["id"] == "22"
 
+    @patch("app.api.v1.endpoints.videos.YtDlpService.fetch_formats")
+    def test_fetch_formats_cache_hit_skips_service(
+        self, mock_fetch: MagicMock, client: TestClient
+    ) -> None:
+        """A cached URL is served from the pre-serialized payload."""
+        from app.services.yt_dlp_service import YtDlpService
+
+        video_info = VideoInfo(
+            title="Cached Video",
+            formats=[
+                Format(id="22", quality_label="720p", mime_type="video/mp4")
+            ],
+        )
+        url = "https://www.youtube.com/watch?v=cached"
+        YtDlpService._cache_set_formats(url, video_info)
+
+        response = client.post("/api/v1/videos/formats", json={"url": url})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+        assert response.json() == video_info.model_dump(mode="json")
+        mock_fetch.assert_not_called()
+
+    @patch.object(settings, "ADMIN_TOKEN", "s3cret")
+    def test_clear_formats_cache(self, client: TestClient) -> None:
+        """DELETE with the admin token drops cached entries."""
+        from app.services.yt_dlp_service import YtDlpService
+
+        url = "https://www.youtube.com/watch?v=cleared"
+        video_info = VideoInfo(
+            title="Cleared",
+            formats=[Format(id="22", quality_label="720p", mime_type="video/mp4")],
+        )
+        YtDlpService._cache_set_formats(url, video_info)
+
+        response = client.delete(
+            "/api/v1/videos/formats/cache",
+            headers={"Authorization": "Bearer s3cret"},
+        )
+
+        assert response.status_code == 204
+        assert YtDlpService.get_cached_entry(url) is None
+
+    @patch("app.api.v1.endpoints.videos.YtDlpService.clear_cache")
+    def test_clear_formats_cache_requires_admin(
+        self, mock_clear: MagicMock, client: TestClient
+    ) -> None:
+        """Disabled without ADMIN_TOKEN; forbidden with a wrong token."""
+        assert client.delete("/api/v1/videos/formats/cache").status_code == 404
+
+        with patch.object(settings, "ADMIN_TOKEN", "s3cret"):
+            response = client.delete(
+                "/api/v1/videos/formats/cache",
+                headers={"Authorization": "Bearer guess"},
+            )
+        assert response.status_code == 403
+        mock_clear.assert_not_called()
+
     def test_fetch_formats_invalid_url(self, client: TestClient) -> None:
         """Test format fetching with invalid URL."""
         response = client.post(
@@ -92,7 +152,11 @@ class TestDownloadStartEndpoint:
     """Tests for progress-tracked download start endpoint."""
 
     @patch("app.api.v1.endpoints.videos.YtDlpService.download_single_with_progress")
-    @patch("app.api.v1.endpoints.videos.YtDlpService.get_cached_formats", return_value=None)
+    @patch(
+        "app.api.v1.endpoints.videos.YtDlpService.get_cached_entry_async",
+        new_callable=AsyncMock,
+        return_value=None,
+    )
     @patch("app.api.v1.endpoints.videos.YtDlpService.fetch_formats")
     def test_download_start_spawns_background_job(
         self,
@@ -131,7 +195,44 @@ class TestDownloadStartEndpoint:
         assert "download_id" in data
         assert "filename" in data
 
-    @patch("app.api.v1.endpoints.videos.YtDlpService.get_cached_formats", return_value=None)
+    @patch("app.api.v1.endpoints.videos.YtDlpService.download_single_with_progress")
+    def test_download_start_reuses_fetched_entry(
+        self, _mock_dl: MagicMock, client: TestClient
+    ) -> None:
+        """A cache miss re-reads the entry fetch_formats stored, not re-serializes."""
+        from app.services.yt_dlp_service import CachedFormats, YtDlpService
+
+        video_info = VideoInfo(
+            title="Fetched",
+            formats=[Format(id="22", quality_label="720p", mime_type="video/mp4")],
+        )
+
+        def _fetch(url: str) -> VideoInfo:
+            YtDlpService._cache_set_formats(url, video_info)
+            return video_info
+
+        with (
+            patch.object(YtDlpService, "fetch_formats", side_effect=_fetch),
+            patch.object(
+                CachedFormats, "from_video_info", wraps=CachedFormats.from_video_info
+            ) as build,
+        ):
+            response = client.post(
+                "/api/v1/videos/download/start",
+                json={
+                    "url": "https://www.youtube.com/watch?v=fetched",
+                    "format_id": "22",
+                },
+            )
+
+        assert response.status_code == 200
+        assert build.call_count == 1  # only the store inside fetch_formats
+
+    @patch(
+        "app.api.v1.endpoints.videos.YtDlpService.get_cached_entry_async",
+        new_callable=AsyncMock,
+        return_value=None,
+    )
     @patch("app.api.v1.endpoints.videos.YtDlpService.fetch_formats")
     def test_download_start_format_not_found(
         self, mock_fetch: MagicMock, _cached: MagicMock, client: TestClient
@@ -164,3 +265,99 @@ class TestDownloadStartEndpoint:
         assert response.status_code == 404
         data = response.json()
         assert data["code"] == "FORMAT_NOT_AVAILABLE"
+
+    @patch("app.api.v1.endpoints.videos.YtDlpService.fetch_formats")
+    def test_download_start_rejects_unsafe_format_id(
+        self, mock_fetch: MagicMock, client: TestClient
+    ) -> None:
+        """Disallowed format_id characters fail before any metadata fetch."""
+        response = client.post(
+            "/api/v1/videos/download/start",
+            json={
+                "url": "https://www.youtube.com/watch?v=test",
+                "format_id": "22; rm -rf /",
+            },
+        )
+
+        assert response.status_code == 400
+        assert response.json()["code"] == "INVALID_URL"
+        mock_fetch.assert_not_called()
+
+
+class TestDownloadProgressEndpoint:
+    """Tests for the SSE progress stream."""
+
+    def test_progress_emits_final_state_once(self, client: TestClient) -> None:
+        """A finished task yields a single event and closes the stream."""
+        from app.services import download_tasks as dt
+
+        task = dt.create_task("sse-done", filename="x.mp4")
+        task.status = "completed"
+        task.progress = 100.0
+        task.touch()
+
+        response = client.get("/api/v1/videos/download/sse-done/progress")
+
+        assert response.status_code == 200
+        assert response.text.count("event: progress") == 1
+        assert '"status":"completed"' in response.text
+        dt.remove_task("sse-done")
+
+
+class TestDownloadFileEndpoint:
+    """Tests for serving a completed download."""
+
+    def test_download_file_serves_and_cleans_up(
+        self, client: TestClient, tmp_path: Path
+    ) -> None:
+        """Completed file is served with headers and its temp dir is removed."""
+        from app.services import download_tasks as dt
+
+        temp_dir = tmp_path / "ytdl_test"
+        temp_dir.mkdir()
+        file_path = temp_dir / "out.mp4"
+        file_path.write_bytes(b"x" * 1024)
+
+        task = dt.create_task("file-ok", filename="Test Video.mp4")
+        task.status = "completed"
+        task.file_path = str(file_path)
+        task.temp_dir = str(temp_dir)
+        task.file_size = 1024
+
+        response = client.get("/api/v1/videos/download/file-ok/file")
+
+        assert response.status_code == 200
+        assert response.content == b"x" * 1024
+        assert response.headers["content-length"] == "1024"
+        assert response.headers["content-type"] == "video/mp4"
+        assert "Test_Video.mp4" in response.headers["content-disposition"]
+        assert dt.get_task("file-ok") is None
+        assert not temp_dir.exists()
+
+    def test_head_probe_keeps_task(self, client: TestClient) -> None:
+        """HEAD reports the file's size and type and leaves the task for GET."""
+        from app.services import download_tasks as dt
+
+        task = dt.create_task("file-head", filename="Test Video.mp4")
+        task.status = "completed"
+        task.file_size = 1024
+
+        response = client.head("/api/v1/videos/download/file-head/file")
+
+        assert response.status_code == 200
+        assert response.headers["content-length"] == "1024"
+        assert response.headers["content-type"] == "video/mp4"
+        assert "Test_Video.mp4" in response.headers["content-disposition"]
+        assert dt.get_task("file-head") is task
+        dt.remove_task("file-head")
+
+    def test_head_probe_unfinished_download(self, client: TestClient) -> None:
+        """HEAD mirrors GET: a running download is not servable yet."""
+        from app.services import download_tasks as dt
+
+        dt.create_task("file-busy", filename="x.mp4").set_status("downloading")
+
+        response = client.head("/api/v1/videos/download/file-busy/file")
+
+        assert response.status_code == 409
+        dt.remove_task("file-busy")
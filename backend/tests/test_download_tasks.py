@@ -1,5 +1,11 @@
 """Tests for in-memory download task registry."""
+import gc
+import heapq
+import threading
 import time
+from pathlib import Path
+
+import pytest
 
 from app.services import download_tasks as dt
 
@@ -19,13 +25,124 @@ class TestDownloadTasks:
         assert removed is not None
         assert dt.get_task("rm-me") is None
 
-    def test_cleanup_stale_removes_old_tasks(self, tmp_path: object) -> None:
+    def test_cleanup_stale_removes_old_tasks(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
         tid = "stale-1"
         task = dt.create_task(tid)
-        # Force age without sleeping 30 minutes: patch created_at
-        task.created_at = time.time() - 4000
-        task.temp_dir = str(tmp_path)
+        task.temp_dir = str(tmp_path / "ytdl_stale")
+        Path(task.temp_dir).mkdir()
 
+        # Force age without sleeping 30 minutes: run the sweep in the future
+        real_monotonic = time.monotonic
+        monkeypatch.setattr(dt.time, "monotonic", lambda: real_monotonic() + 4000)
         dt.cleanup_stale(max_age=3600)
 
         assert dt.get_task(tid) is None
+        dt._gc_executor.submit(lambda: None).result(timeout=5)
+        assert not Path(task.temp_dir).exists()
+
+    def test_writes_publish_new_mapping(self) -> None:
+        """Writers never mutate a dict a reader may already hold."""
+        dt.create_task("cow-1")
+        before = dt._tasks
+        dt.create_task("cow-2")
+        dt.remove_task("cow-1")
+
+        assert "cow-2" not in before
+        assert "cow-1" in before
+        assert dt.get_task("cow-1") is None
+        assert dt.get_task("cow-2") is not None
+        dt.remove_task("cow-2")
+
+    def test_snapshot_includes_error_only_when_set(self) -> None:
+        task = dt.DownloadTask(task_id="snap", progress=42.123)
+        snap = task.snapshot()
+        assert snap["progress"] == 42.1
+        assert "error" not in snap
+
+        task.status = "failed"
+        task.error = "boom"
+        assert task.snapshot()["error"] == "boom"
+
+    def test_swept_task_is_never_reused(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """A new download gets a fresh task; a held swept one stays intact."""
+        task = dt.create_task("held", filename="held.mp4")
+        task.status = "completed"
+
+        real_monotonic = time.monotonic
+        monkeypatch.setattr(dt.time, "monotonic", lambda: real_monotonic() + 4000)
+        dt.cleanup_stale(max_age=3600)
+        monkeypatch.undo()
+        fresh = dt.create_task("new-held", filename="new.mp4")
+
+        assert fresh is not task
+        assert task.task_id == "held"
+        assert task.filename == "held.mp4"
+        assert dt.find_task("held") is task
+        dt.remove_task("new-held")
+
+    def test_cleanup_stale_skips_reused_id(self) -> None:
+        """An expired heap entry must not evict a newer task with the same ID."""
+        dt.create_task("reused")
+        # Leftover entry from an earlier task that used the same ID
+        heapq.heappush(dt._expiry_heap, (0.0, "reused"))
+
+        dt.cleanup_stale(max_age=3600)
+
+        assert dt.get_task("reused") is not None
+        dt.remove_task("reused")
+
+    def test_list_active_follows_status(self) -> None:
+        task = dt.create_task("active-1")
+        assert "active-1" not in dt.list_active()
+
+        task.set_status("downloading")
+        assert "active-1" in dt.list_active()
+        task.set_status("merging")
+        assert "active-1" in dt.list_active()
+        task.set_status("completed")
+        assert "active-1" not in dt.list_active()
+
+        task.set_status("downloading")
+        dt.remove_task("active-1")
+        assert "active-1" not in dt.list_active()
+
+    def test_render_sse_frame(self) -> None:
+        task = dt.DownloadTask(task_id="frame", speed='1.0MiB/s "x"')
+        frame = task.render_sse()
+        assert frame.startswith(b"event: progress\ndata: {")
+        assert frame.endswith(b"}\n\n")
+        assert b'"speed":"1.0MiB/s \\"x\\""' in frame
+
+    def test_publish_progress_bumps_seq_once(self) -> None:
+        task = dt.DownloadTask(task_id="pub")
+        seq = task.dirty_seq
+        task.publish_progress(42.0, 420, 1000, "1.0MiB/s", "00:01")
+        assert task.dirty_seq == seq + 1
+        snap = task.snapshot()
+        assert snap["progress"] == 42.0
+        assert snap["downloaded_bytes"] == 420
+        assert snap["eta"] == "00:01"
+
+    async def test_wait_for_update_wakes_on_touch(self) -> None:
+        task = dt.DownloadTask(task_id="wake")
+        seq = task.dirty_seq
+        threading.Timer(0.05, task.touch).start()
+
+        assert await task.wait_for_update(seq, timeout=5.0) is True
+        assert task._waiters == ()
+        assert await task.wait_for_update(task.dirty_seq, timeout=0.01) is False
+
+    def test_find_task_sees_removed_task_while_referenced(self) -> None:
+        task = dt.create_task("weak-1")
+        dt.remove_task("weak-1")
+
+        assert dt.get_task("weak-1") is None
+        assert dt.find_task("weak-1") is task
+
+        del task
+        gc.collect()
+        assert dt.find_task("weak-1") is None
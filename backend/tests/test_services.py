@@ -1,11 +1,29 @@
 """Tests for the yt-dlp service layer."""
-from unittest.mock import MagicMock, patch
-
+import asyncio
+import os
+import shutil
+import subprocess
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import orjson
 import pytest
+import yt_dlp
 
+from app.core.config import settings
 from app.models.video import Format, VideoInfo
+from app.services import yt_dlp_service as ytdlp_service
+from app.services.download_tasks import DownloadTask
 from app.services.errors import InvalidUrlError, VideoNotFoundError, YtdlpFailedError
-from app.services.yt_dlp_service import YtDlpService
+from app.services.yt_dlp_service import CachedFormats, YtDlpService
+from app.services.ytdlp.constants import PROGRESS_TEMPLATE
+from app.services.ytdlp.disk_cache import FormatsDiskCache
+from app.services.ytdlp.disk_space import parse_size_bytes
+from app.services.ytdlp.pipe_reactor import PipeReactor, get_pipe_reactor
 
 
 class TestNormalizeUrl:
@@ -17,27 +35,77 @@ class TestNormalizeUrl:
         result = YtDlpService.normalize_url(url)
         assert result == "https://www.youtube.com/watch?v=test"
 
-    def test_normalize_url_invalid_scheme(self) -> None:
-        """Test rejection of invalid URL schemes."""
-        with pytest.raises(InvalidUrlError, match="scheme not allowed"):
-            YtDlpService.normalize_url("ftp://example.com/video")
-
-    def test_normalize_url_localhost_blocked(self) -> None:
-        """Test blocking of localhost URLs."""
+    @pytest.mark.parametrize(
+        ("url", "match"),
+        [
+            ("ftp://example.com/video", "scheme not allowed"),
+            ("http://localhost:8080/video", "Localhost"),
+            ("http://192.168.1.1/video", "Private network"),
+        ],
+        ids=["invalid-scheme", "localhost", "private-ip"],
+    )
+    def test_normalize_url_rejects(self, url: str, match: str) -> None:
+        """Disallowed schemes, localhost and private IPs are rejected."""
+        with pytest.raises(InvalidUrlError, match=match):
+            YtDlpService.normalize_url(url)
+
+    def test_normalize_url_simple_shape_still_validated(self) -> None:
+        """Plain host/path URLs that may be unsafe fall through to full checks."""
         with pytest.raises(InvalidUrlError, match="Localhost"):
-            YtDlpService.normalize_url("http://localhost:8080/video")
-
-    def test_normalize_url_private_ip_blocked(self) -> None:
-        """Test blocking of private IP addresses."""
+            YtDlpService.normalize_url("http://LOCALHOST/video")
         with pytest.raises(InvalidUrlError, match="Private network"):
-            YtDlpService.normalize_url("http://192.168.1.1/video")
+            YtDlpService.normalize_url("https://10.0.0.1/video")
+
+    def test_normalize_url_ip_literals_on_full_path(self) -> None:
+        """IP hosts that miss the fast path are still classified; DNS names pass."""
+        for url in ("http://[::1]/video", "http://user@127.0.0.1:80/video"):
+            with pytest.raises(InvalidUrlError, match="Private network"):
+                YtDlpService.normalize_url(url)
+        url = "https://user@www.youtube.com:443/watch?v=x"
+        assert YtDlpService.normalize_url(url) == url
+
+    def test_normalize_url_memoizes_accepted_urls(self) -> None:
+        """Repeat validations of one raw URL reuse the first result."""
+        url = "https://www.youtube.com/watch?v=memo"
+        with patch.object(
+            YtDlpService, "_normalize_url_uncached", return_value=url
+        ) as mock_validate:
+            assert YtDlpService.normalize_url(url) == url
+            assert YtDlpService.normalize_url(url) == url
+        mock_validate.assert_called_once_with(url)
+
+    def test_sanitize_url_for_logging_strips_secrets(self) -> None:
+        """Query, fragment, credentials and port are left out of log URLs."""
+        safe = YtDlpService._sanitize_url_for_logging(
+            "https://user:pw@WWW.YouTube.com:443/watch?v=abc#t=1"
+        )
+        assert safe.startswith("https://www.youtube.com/watch (hash:")
+        assert YtDlpService._sanitize_url_for_logging("not a url") == "invalid-url"
+
+    def test_lazy_safe_url_sanitizes_only_when_formatted(self) -> None:
+        """Log URLs are sanitized on first str() and then reused."""
+        url = "https://www.youtube.com/watch?v=abc"
+        with patch.object(
+            YtDlpService,
+            "_sanitize_url_for_logging",
+            wraps=YtDlpService._sanitize_url_for_logging,
+        ) as mock_sanitize:
+            lazy = ytdlp_service._LazySafeUrl(url)
+            mock_sanitize.assert_not_called()
+            assert str(lazy) == str(lazy)
+        mock_sanitize.assert_called_once_with(url)
 
 
 class TestFetchFormats:
     """Tests for fetching video formats."""
 
-    @patch("app.services.yt_dlp_service.yt_dlp.YoutubeDL")
-    def test_fetch_formats_success(self, mock_ydl_class: MagicMock) -> None:
+    @pytest.fixture
+    def ydl(self) -> Iterator[MagicMock]:
+        """Patch ``yt_dlp.YoutubeDL`` and yield the instance its ``with`` binds."""
+        with patch("app.services.yt_dlp_service.yt_dlp.YoutubeDL") as mock_ydl_class:
+            yield mock_ydl_class.return_value.__enter__.return_value
+
+    def test_fetch_formats_success(self, ydl: MagicMock) -> None:
         """Test successful format fetching."""
         # Mock yt-dlp response
         mock_info = {
@@ -64,9 +132,7 @@ class TestFetchFormats:
             ],
         }
 
-        mock_ydl = MagicMock()
-        mock_ydl.extract_info.return_value = mock_info
-        mock_ydl_class.return_value.__enter__.return_value = mock_ydl
+        ydl.extract_info.return_value = mock_info
 
         # Execute
         result = YtDlpService.fetch_formats("https://www.youtube.com/watch?v=test")
@@ -79,51 +145,118 @@ class TestFetchFormats:
 
         # Merged formats are prepended (Best Available + 720p tier = 2 merged)
         # plus 2 original formats = 4 total
-        merged_fmts = [f for f in result.formats if "merged" in f.quality_label.lower() or "best available" in f.quality_label.lower()]
-        assert len(merged_fmts) >= 1  # At least Best Available merged
-        raw_fmts = [f for f in result.formats if f.id in ("22", "140")]
-        assert len(raw_fmts) == 2
+        by_id = {f.id: f for f in result.formats}
+        assert len(by_id) == len(result.formats) == 4
+        assert result.formats[0].quality_label == "Best Available (Merged)"
+        assert result.formats[1].quality_label == "HD (720p) (Merged)"
 
         # Check video format
-        video_fmt = next(f for f in result.formats if f.id == "22")
+        video_fmt = by_id["22"]
         assert video_fmt.quality_label == "720p"
         assert video_fmt.mime_type == "video/mp4"
         assert video_fmt.filesize_bytes == 12345678
         assert not video_fmt.is_audio_only
 
         # Check audio format
-        audio_fmt = next(f for f in result.formats if f.id == "140")
+        audio_fmt = by_id["140"]
         assert audio_fmt.quality_label == "128kbps"
         assert audio_fmt.is_audio_only
 
-    @patch("app.services.yt_dlp_service.yt_dlp.YoutubeDL")
-    def test_fetch_formats_video_not_found(self, mock_ydl_class: MagicMock) -> None:
+    def test_fetch_formats_video_not_found(self, ydl: MagicMock) -> None:
         """Test handling of video not found error."""
-        mock_ydl = MagicMock()
-        mock_ydl.extract_info.side_effect = Exception("Video unavailable")
-        mock_ydl_class.return_value.__enter__.return_value = mock_ydl
+        ydl.extract_info.side_effect = Exception("Video unavailable")
 
         # Should raise VideoNotFoundError or YtdlpFailedError
         with pytest.raises((VideoNotFoundError, YtdlpFailedError)):
             YtDlpService.fetch_formats("https://www.youtube.com/watch?v=invalid")
 
+    def test_raw_url_hit_skips_normalize(self) -> None:
+        """A repeated raw URL is answered from its alias without re-validation."""
+        raw = "  https://www.youtube.com/watch?v=alias  "
+        video_info = VideoInfo(
+            title="Alias",
+            formats=[Format(id="22", quality_label="720p", mime_type="video/mp4")],
+        )
+        YtDlpService._cache_set_formats(raw.strip(), video_info, raw)
+
+        with patch.object(YtDlpService, "normalize_url") as mock_normalize:
+            assert YtDlpService.fetch_formats(raw) is video_info
+            assert YtDlpService.get_cached_formats(raw.strip()) is video_info
+        mock_normalize.assert_not_called()
+
+    def test_concurrent_misses_share_one_extraction(self) -> None:
+        """Simultaneous misses for one URL wait on a single in-flight fetch."""
+        url = "https://www.youtube.com/watch?v=burst"
+        video_info = VideoInfo(
+            title="Burst",
+            formats=[Format(id="22", quality_label="720p", mime_type="video/mp4")],
+        )
+        started = threading.Event()
+        release = threading.Event()
+        calls = 0
+
+        def slow_extract(norm_url: str, raw_url: str) -> VideoInfo:
+            nonlocal calls
+            calls += 1
+            started.set()
+            release.wait(5)
+            YtDlpService._cache_set_formats(norm_url, video_info, raw_url)
+            return video_info
+
+        results: list[VideoInfo] = []
+        with patch.object(YtDlpService, "_extract_formats", side_effect=slow_extract):
+            threads = [
+                threading.Thread(target=lambda: results.append(YtDlpService.fetch_formats(url)))
+                for _ in range(4)
+            ]
+            threads[0].start()
+            assert started.wait(5)
+            for t in threads[1:]:
+                t.start()
+            release.set()
+            for t in threads:
+                t.join(5)
+
+        assert calls == 1
+        assert results == [video_info] * 4
+        assert YtDlpService._inflight == {}
+
+    def test_not_found_is_negatively_cached(self) -> None:
+        """A not-found result is replayed without re-running the extractor."""
+        url = "https://www.youtube.com/watch?v=gone"
+        with patch.object(
+            YtDlpService, "_extract_formats", side_effect=VideoNotFoundError("gone")
+        ) as mock_extract:
+            for _ in range(2):
+                with pytest.raises(VideoNotFoundError, match="gone"):
+                    YtDlpService.fetch_formats(url)
+            assert mock_extract.call_count == 1
+
+            YtDlpService.clear_cache()
+            with pytest.raises(VideoNotFoundError):
+                YtDlpService.fetch_formats(url)
+            assert mock_extract.call_count == 2
+
+    def test_info_json_unencodable_info_is_skipped(self) -> None:
+        """Info yt-dlp cannot sanitize disables --load-info-json, not the fetch."""
+        with yt_dlp.YoutubeDL({"quiet": True}) as ydl:
+            assert YtDlpService._encode_info_json(ydl, {"id": "x", "m": {1: "a"}}) is None
+            payload = YtDlpService._encode_info_json(ydl, {"id": "x", "formats": []})
+        assert payload is not None
+        assert orjson.loads(payload)["id"] == "x"
+
 
 class TestBuildDownloadCommand:
     """Tests for download command construction (single-stream only)."""
 
     _URL = "https://www.youtube.com/watch?v=test"
 
-    def test_single_stream_no_merge_flags(self) -> None:
+    @pytest.mark.parametrize("fmt_id", ["22", "140", "251", "bestaudio"])
+    def test_single_stream_no_merge_flags(self, fmt_id: str) -> None:
         """Single-stream format IDs must NOT get merge flags."""
-        single_ids = ["22", "140", "251", "bestaudio"]
-        for fmt_id in single_ids:
-            cmd = YtDlpService.build_download_command(self._URL, fmt_id)
-            assert "--merge-output-format" not in cmd, (
-                f"Unexpected --merge-output-format for single stream {fmt_id}"
-            )
-            assert "--ppa" not in cmd, (
-                f"Unexpected --ppa for single stream {fmt_id}"
-            )
+        cmd = YtDlpService.build_download_command(self._URL, fmt_id)
+        assert "--merge-output-format" not in cmd
+        assert "--ppa" not in cmd
 
     def test_stdout_output(self) -> None:
         """Command must write to stdout (-o -)."""
@@ -139,26 +272,63 @@ class TestBuildDownloadCommand:
         f_idx = cmd.index("-f")
         assert cmd[f_idx + 1] == fmt_id
 
+    def test_info_json_replaces_url(self) -> None:
+        """With a cached info dict the child reads it from stdin."""
+        cmd = YtDlpService.build_download_command(self._URL, "22", info_json=True)
+        assert cmd[-2:] == ["--load-info-json", "-"]
+        assert self._URL not in cmd
+
+    def test_shared_args_built_once(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Settings-derived flags are computed once and reused by every builder."""
+        monkeypatch.setattr(settings, "YTDLP_PROXY", "http://proxy:3128")
+        with patch.object(
+            YtDlpService,
+            "_make_shared_download_args",
+            wraps=YtDlpService._make_shared_download_args,
+        ) as mock_make:
+            single = YtDlpService.build_download_command(self._URL, "22")
+            merged = YtDlpService._build_merged_download_cmd(
+                self._URL, "bestvideo+bestaudio", "out.%(ext)s"
+            )
+        assert mock_make.call_count == 1
+        for cmd in (single, merged):
+            assert cmd[cmd.index("--proxy") + 1] == "http://proxy:3128"
+
+
+@pytest.fixture(scope="module")
+def merged_formats() -> list[Format]:
+    """Merged options for a 1080p/720p video, built once per module."""
+    raw_formats = [
+        {"format_id": "137", "height": 1080, "ext": "mp4", "vcodec": "avc1",
+         "acodec": "none", "filesize": 50000000},
+        {"format_id": "136", "height": 720, "ext": "mp4", "vcodec": "avc1",
+         "acodec": "none", "filesize": 30000000},
+        {"format_id": "140", "abr": 128, "ext": "m4a", "vcodec": "none",
+         "acodec": "mp4a", "filesize": 5000000},
+    ]
+    _formats, heights = YtDlpService._normalize_formats(raw_formats)
+    return YtDlpService._create_merged_formats(heights)
+
 
 class TestMergedFormatSelectors:
     """Tests for merged format selector construction."""
 
-    def _get_sample_formats(self) -> list[Format]:
-        return [
-            Format(id="137", quality_label="1080p", mime_type="video/mp4",
-                   filesize_bytes=50000000, is_audio_only=False, is_video_only=True),
-            Format(id="136", quality_label="720p", mime_type="video/mp4",
-                   filesize_bytes=30000000, is_audio_only=False, is_video_only=True),
-            Format(id="140", quality_label="128kbps", mime_type="audio/m4a",
-                   filesize_bytes=5000000, is_audio_only=True, is_video_only=False),
+    def test_tiers_are_shared_and_filtered(
+        self, merged_formats: list[Format]
+    ) -> None:
+        """Prebuilt tier formats are reused, and only offered heights appear."""
+        assert [f.quality_label for f in merged_formats] == [
+            "Best Available (Merged)",
+            "Full HD (1080p) (Merged)",
+            "HD (720p) (Merged)",
         ]
+        assert [f._height for f in merged_formats] == [0, 1080, 720]
+        again = YtDlpService._create_merged_formats({1080, 720})
+        assert all(a is b for a, b in zip(merged_formats, again, strict=True))
 
-    def test_no_bare_best_fallback(self) -> None:
+    def test_no_bare_best_fallback(self, merged_formats: list[Format]) -> None:
         """Merged format IDs must NEVER contain a bare '/best' without codec filter."""
-        formats = self._get_sample_formats()
-        merged = YtDlpService._create_merged_formats(formats)
-
-        for fmt in merged:
+        for fmt in merged_formats:
             # Split on '/' to get each fallback tier
             tiers = fmt.id.split("/")
             for tier in tiers:
@@ -174,12 +344,9 @@ class TestMergedFormatSelectors:
                         f"Full ID: {fmt.id}"
                     )
 
-    def test_all_selectors_prefer_avc(self) -> None:
+    def test_all_selectors_prefer_avc(self, merged_formats: list[Format]) -> None:
         """Every fallback tier in merged selectors must reference avc."""
-        formats = self._get_sample_formats()
-        merged = YtDlpService._create_merged_formats(formats)
-
-        for fmt in merged:
+        for fmt in merged_formats:
             tiers = fmt.id.split("/")
             for tier in tiers:
                 assert "avc" in tier.lower(), (
@@ -187,21 +354,540 @@ class TestMergedFormatSelectors:
                     f"constrain to H.264 (avc). Full ID: {fmt.id}"
                 )
 
-    def test_merged_formats_generated_for_available_heights(self) -> None:
+    def test_merged_formats_generated_for_available_heights(
+        self, merged_formats: list[Format]
+    ) -> None:
         """Merged formats are created for heights present in raw formats."""
-        formats = self._get_sample_formats()
-        merged = YtDlpService._create_merged_formats(formats)
-
-        labels = [f.quality_label for f in merged]
+        labels = [f.quality_label for f in merged_formats]
         assert any("Best Available" in label for label in labels)
         assert any("1080" in label for label in labels)
         assert any("720" in label for label in labels)
         # 480p is not available in sample, so no 480 tier
         assert not any("480" in label for label in labels)
 
-    def test_merged_formats_all_mp4_mime(self) -> None:
+    def test_merged_formats_all_mp4_mime(self, merged_formats: list[Format]) -> None:
         """All merged formats must have video/mp4 mime type."""
-        formats = self._get_sample_formats()
-        merged = YtDlpService._create_merged_formats(formats)
-        for fmt in merged:
+        for fmt in merged_formats:
             assert fmt.mime_type == "video/mp4"
+
+
+    def test_formats_sorted_merged_first_then_height(self) -> None:
+        """Best merged, merged tiers by height, video by height, audio last."""
+        info = {
+            "title": "t",
+            "formats": [
+                {"format_id": "140", "abr": 128, "ext": "m4a", "vcodec": "none",
+                 "acodec": "mp4a"},
+                {"format_id": "136", "height": 720, "ext": "mp4", "vcodec": "avc1",
+                 "acodec": "none"},
+                {"format_id": "137", "height": 1080, "ext": "mp4", "vcodec": "avc1",
+                 "acodec": "none"},
+            ],
+        }
+        video_info = YtDlpService._extract_video_info(info)
+
+        labels = [f.quality_label for f in video_info.formats]
+        assert labels == [
+            "Best Available (Merged)",
+            "Full HD (1080p) (Merged)",
+            "HD (720p) (Merged)",
+            "1080p",
+            "720p",
+            "128kbps",
+        ]
+
+
+class TestDownloadFormat:
+    """Tests for the streaming download subprocess."""
+
+    async def test_spawns_async_subprocess_with_pipes(self) -> None:
+        """With a progress callback, yt-dlp runs with piped stdout and stderr."""
+        with patch(
+            "app.services.yt_dlp_service.asyncio.create_subprocess_exec",
+            new_callable=AsyncMock,
+        ) as mock_exec:
+            process = await YtDlpService.download_format(
+                "https://www.youtube.com/watch?v=test", "22", progress_callback=MagicMock()
+            )
+
+        assert process is mock_exec.return_value
+        args, kwargs = mock_exec.call_args
+        assert args[0] == "yt-dlp"
+        assert kwargs["stdout"] == asyncio.subprocess.PIPE
+        assert kwargs["stderr"] == asyncio.subprocess.PIPE
+
+    async def test_discards_stderr_without_progress_callback(self) -> None:
+        """Nobody reads stderr without a progress callback, so no pipe is made."""
+        with patch(
+            "app.services.yt_dlp_service.asyncio.create_subprocess_exec",
+            new_callable=AsyncMock,
+        ) as mock_exec:
+            await YtDlpService.download_format("https://www.youtube.com/watch?v=test", "22")
+
+        _, kwargs = mock_exec.call_args
+        assert kwargs["stdout"] == asyncio.subprocess.PIPE
+        assert kwargs["stderr"] == asyncio.subprocess.DEVNULL
+
+    async def test_feeds_cached_info_json_on_stdin(self) -> None:
+        """A cached extraction is piped to the child instead of the URL."""
+        url = "https://www.youtube.com/watch?v=test"
+        video_info = VideoInfo(
+            title="Cached",
+            formats=[Format(id="22", quality_label="720p", mime_type="video/mp4")],
+        )
+        YtDlpService._cache_set_formats(url, video_info, info_json=b'{"id":"test"}')
+
+        with patch(
+            "app.services.yt_dlp_service.asyncio.create_subprocess_exec",
+            new_callable=AsyncMock,
+            return_value=MagicMock(),
+        ) as mock_exec:
+            process = await YtDlpService.download_format(url, "22")
+
+        args, kwargs = mock_exec.call_args
+        assert args[-2:] == ("--load-info-json", "-")
+        assert kwargs["stdin"] == asyncio.subprocess.PIPE
+        process.stdin.write.assert_called_once_with(b'{"id":"test"}')
+        process.stdin.close.assert_called_once()
+
+    async def test_rejects_invalid_format_id(self) -> None:
+        """Unsafe format IDs are rejected before any process is spawned."""
+        with pytest.raises(InvalidUrlError):
+            await YtDlpService.download_format(
+                "https://www.youtube.com/watch?v=test", "22; rm -rf /"
+            )
+
+
+class TestParseSizeBytes:
+    """Tests for yt-dlp size string decoding."""
+
+    @pytest.mark.parametrize(
+        ("value", "unit", "expected"),
+        [
+            ("422.93", "KiB", int(422.93 * 1024)),
+            ("1.5", "GiB", int(1.5 * 1024**3)),
+            ("2", "kB", 2000),
+            ("3", "MB", 3_000_000),
+            ("7", "B", 7),
+            ("7", "TiB", 7),
+            ("bad", "MiB", 0),
+        ],
+    )
+    def test_units(self, value: str, unit: str, expected: int) -> None:
+        """Binary, decimal and unknown units decode like yt-dlp prints them."""
+        assert parse_size_bytes(value, unit) == expected
+
+
+_NS = 1_000_000_000
+
+
+class TestTimedDict:
+    """Tests for the per-shard TTL map behind the formats cache."""
+
+    def test_expiry_and_size_bound(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Expired entries read as misses; overflow evicts the oldest."""
+        now = [1000 * _NS]
+        monkeypatch.setattr(ytdlp_service.time, "monotonic_ns", lambda: now[0])
+        entry = CachedFormats.from_video_info(
+            VideoInfo(
+                title="T",
+                formats=[Format(id="22", quality_label="720p", mime_type="video/mp4")],
+            )
+        )
+        cache = ytdlp_service._TimedDict(maxsize=2, ttl=10)
+
+        cache["a"] = entry
+        now[0] += _NS
+        cache["b"] = entry
+        now[0] += _NS
+        cache["c"] = entry
+        assert len(cache) == 2
+        assert cache.get("a") is None
+        assert cache.get("b") is entry
+
+        now[0] += 10 * _NS
+        assert cache.get("b") is None
+        assert cache.get("c") is None
+
+    def test_overflow_evicts_least_recently_read(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """A hit refreshes recency, so the untouched entry is evicted first."""
+        monkeypatch.setattr(ytdlp_service.time, "monotonic_ns", lambda: 1000 * _NS)
+        entry = object()
+        cache = ytdlp_service._TimedDict[object](maxsize=2, ttl=10)
+
+        cache["a"] = entry
+        cache["b"] = entry
+        assert cache.get("a") is entry
+        cache["c"] = entry
+        assert cache.get("b") is None
+        assert cache.get("a") is entry
+        assert cache.get("c") is entry
+
+    def test_unlocked_reads_survive_concurrent_eviction(self) -> None:
+        """Reads race writers' evictions without raising."""
+        cache = ytdlp_service._TimedDict[int](maxsize=8, ttl=60)
+        lock = threading.Lock()
+        errors: list[BaseException] = []
+
+        def write() -> None:
+            for i in range(20_000):
+                with lock:
+                    cache[str(i % 32)] = i
+
+        def read() -> None:
+            try:
+                for i in range(20_000):
+                    cache.get(str(i % 32))
+            except BaseException as e:  # pragma: no cover - failure path
+                errors.append(e)
+
+        threads = [threading.Thread(target=write)] + [
+            threading.Thread(target=read) for _ in range(3)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert errors == []
+        assert len(cache) <= 8
+
+
+class TestLargestOutput:
+    def test_picks_largest_visible_file(self, tmp_path: Path) -> None:
+        (tmp_path / "video.mp4").write_bytes(b"x" * 100)
+        (tmp_path / "thumb.jpg").write_bytes(b"x" * 10)
+        (tmp_path / ".hidden").write_bytes(b"x" * 1000)
+        (tmp_path / "subdir").mkdir()
+
+        assert ytdlp_service._largest_output(str(tmp_path)) == (
+            str(tmp_path / "video.mp4"),
+            100,
+        )
+
+    def test_empty_directory(self, tmp_path: Path) -> None:
+        assert ytdlp_service._largest_output(str(tmp_path)) is None
+
+
+class TestPipeReactor:
+    def test_delivers_lines_then_signals_eof(self) -> None:
+        read_fd, write_fd = os.pipe()
+        lines: list[bytes] = []
+        done = PipeReactor().watch(read_fd, lines.append)
+
+        os.write(write_fd, b"one\ntw")
+        os.write(write_fd, b"o\nunterminated")
+        os.close(write_fd)
+
+        assert done.wait(5)
+        os.close(read_fd)
+        assert lines == [b"one", b"two", b"unterminated"]
+
+    def test_reused_fd_replaces_stale_watch(self) -> None:
+        """A pipe closed without unwatch() can't wedge the reactor thread."""
+        reactor = PipeReactor()
+        stale_r, stale_w = os.pipe()
+        stale_done = reactor.watch(stale_r, lambda _line: None)
+        deadline = time.monotonic() + 5
+        while stale_r not in reactor._selector.get_map():
+            assert time.monotonic() < deadline
+            time.sleep(0.001)
+        os.close(stale_r)
+        os.close(stale_w)
+
+        # Put the next pipe on the stale number, as the kernel usually would
+        read_fd, write_fd = os.pipe()
+        if read_fd != stale_r:
+            os.dup2(read_fd, stale_r)
+            os.close(read_fd)
+            read_fd = stale_r
+        lines: list[bytes] = []
+        done = reactor.watch(read_fd, lines.append)
+        os.write(write_fd, b"fresh\n")
+        os.close(write_fd)
+
+        assert done.wait(5)
+        assert stale_done.is_set()
+        assert lines == [b"fresh"]
+        os.close(read_fd)
+
+    def test_unwatch_releases_open_pipe(self) -> None:
+        """unwatch() drops a pipe that never reaches EOF and wakes its waiter."""
+        reactor = PipeReactor()
+        read_fd, write_fd = os.pipe()
+        done = reactor.watch(read_fd, lambda _line: None)
+
+        assert reactor.unwatch(read_fd)
+        assert done.is_set()
+        assert read_fd not in reactor._selector.get_map()
+        os.close(read_fd)
+        os.close(write_fd)
+
+
+class _HangingPopen:
+    """Popen stand-in whose pipes stay open (a grandchild holds them)."""
+
+    def __init__(self, *_args: Any, **_kwargs: Any) -> None:
+        out_r, self._out_w = os.pipe()
+        err_r, self._err_w = os.pipe()
+        self.stdin = None
+        self.stdout = os.fdopen(out_r, "rb", buffering=0)
+        self.stderr = os.fdopen(err_r, "rb", buffering=0)
+        self.killed = False
+        self.reaped = False
+
+    def wait(self, timeout: float | None = None) -> int:
+        if not self.killed:
+            raise subprocess.TimeoutExpired("yt-dlp", timeout or 0)
+        self.reaped = True
+        return -9
+
+    def kill(self) -> None:
+        self.killed = True
+
+    def close_writers(self) -> None:
+        os.close(self._out_w)
+        os.close(self._err_w)
+
+
+class TestDownloadSingleWithProgress:
+    """Tests for the subprocess-backed single-stream download."""
+
+    @patch("app.services.yt_dlp_service.check_disk_space")
+    def test_timeout_reaps_child_and_releases_pipes(self, _disk: MagicMock) -> None:
+        """A timed-out child is killed and reaped, and its fds are unwatched."""
+        procs: list[_HangingPopen] = []
+
+        def _popen(*args: Any, **kwargs: Any) -> _HangingPopen:
+            procs.append(_HangingPopen(*args, **kwargs))
+            return procs[-1]
+
+        task = DownloadTask(task_id="timeout")
+        with patch("app.services.yt_dlp_service.subprocess.Popen", _popen):
+            YtDlpService.download_single_with_progress(
+                "https://www.youtube.com/watch?v=test", "22", task
+            )
+
+        (proc,) = procs
+        assert task.status == "failed"
+        assert task.error == "Download timed out (1-hour limit)"
+        assert proc.killed and proc.reaped
+        assert proc.stdout.closed and proc.stderr.closed
+        reactor_fds = get_pipe_reactor()._selector.get_map()
+        proc.close_writers()
+
+        # The freed fd numbers are reused by the next download's pipes
+        read_fd, write_fd = os.pipe()
+        assert read_fd not in reactor_fds
+        done = get_pipe_reactor().watch(read_fd, lambda _line: None)
+        os.close(write_fd)
+        assert done.wait(5)
+        os.close(read_fd)
+
+
+class TestFormatsDiskCache:
+    """Tests for the persistent second-level formats cache."""
+
+    @pytest.fixture
+    def disk_cache_path(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> str:
+        """Point the L2 cache at a temporary SQLite file."""
+        path = str(tmp_path / "formats.sqlite3")
+        monkeypatch.setattr(settings, "YTDLP_FORMATS_DISK_CACHE_PATH", path)
+        return path
+
+    def test_entry_survives_memory_reset(self, disk_cache_path: str) -> None:
+        """An L1 miss is served from disk and promoted back into memory."""
+        url = "https://www.youtube.com/watch?v=persist"
+        video_info = VideoInfo(
+            title="Persisted",
+            formats=[Format(id="22", quality_label="720p", mime_type="video/mp4")],
+        )
+        YtDlpService._cache_set_formats(url, video_info)
+        YtDlpService._formats_cache = None  # simulate a restart of L1
+
+        entry = YtDlpService.get_cached_entry(url)
+        assert entry is not None
+        assert entry.video_info == video_info
+        assert entry.formats_by_id["22"].quality_label == "720p"
+
+        YtDlpService.clear_cache()
+        assert YtDlpService.get_cached_entry(url) is None
+
+    async def test_async_lookup_reads_disk_off_loop(
+        self, disk_cache_path: str
+    ) -> None:
+        """Only the L2 read goes through to_thread; L1 hits stay inline."""
+        url = "https://www.youtube.com/watch?v=offloop"
+        video_info = VideoInfo(
+            title="Off loop",
+            formats=[Format(id="22", quality_label="720p", mime_type="video/mp4")],
+        )
+        YtDlpService._cache_set_formats(url, video_info)
+        YtDlpService._formats_cache = None
+
+        with patch.object(
+            ytdlp_service.asyncio, "to_thread", wraps=asyncio.to_thread
+        ) as to_thread:
+            entry = await YtDlpService.get_cached_entry_async(url)
+            assert entry is not None and entry.video_info == video_info
+            assert to_thread.call_count == 1
+
+            assert await YtDlpService.get_cached_entry_async(url) is entry
+            assert to_thread.call_count == 1
+
+    def test_trims_oldest_past_byte_budget(self, tmp_path: Path) -> None:
+        """Writes past the byte budget evict the oldest entries."""
+        disk = FormatsDiskCache(
+            str(tmp_path / "trim.sqlite3"), ttl_seconds=60, max_bytes=25
+        )
+        disk.set("a", b"x" * 10)
+        disk.set("b", b"x" * 10)
+        disk.set("c", b"x" * 10)
+        assert disk.get("a") is None
+        assert disk.get("c") == b"x" * 10
+        disk.close()
+
+
+class _FakeYoutubeDL(yt_dlp.YoutubeDL):
+    """Stands in for ``yt_dlp.YoutubeDL``: drives the hooks, writes a file."""
+
+    def __init__(self, opts: dict[str, Any]) -> None:  # skips the real setup
+        self.opts = opts
+
+    def __enter__(self) -> "_FakeYoutubeDL":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        return None
+
+    def download(self, url_list: list[str]) -> int:
+        hook = self.opts["progress_hooks"][0]
+        for name, size in (("v.f137.mp4", 100), ("a.f140.m4a", 50)):
+            hook({
+                "status": "downloading",
+                "filename": name,
+                "downloaded_bytes": size // 2,
+                "total_bytes": size,
+                "speed": 1024.0,
+                "eta": 3,
+            })
+            hook({
+                "status": "finished",
+                "filename": name,
+                "downloaded_bytes": size,
+                "total_bytes": size,
+            })
+        self.opts["postprocessor_hooks"][0](
+            {"postprocessor": "Merger", "status": "started"}
+        )
+        Path(self.opts["outtmpl"]["default"] % {"ext": "mp4"}).write_bytes(b"x" * 150)
+        return 0
+
+
+class _StalledYoutubeDL(_FakeYoutubeDL):
+    """Reports no progress until released, then reaches the merge step."""
+
+    release = threading.Event()
+    merge_raised = threading.Event()
+
+    def download(self, url_list: list[str]) -> int:
+        self.release.wait(timeout=5)
+        try:
+            self.opts["postprocessor_hooks"][0](
+                {"postprocessor": "Merger", "status": "started"}
+            )
+        except yt_dlp.utils.DownloadCancelled:
+            self.merge_raised.set()
+            raise
+        return 0
+
+
+class TestDownloadMergedWithProgress:
+    """Tests for the in-process, hook-driven merged download."""
+
+    @patch("app.services.yt_dlp_service.check_disk_space")
+    @patch("app.services.yt_dlp_service.yt_dlp.YoutubeDL", _FakeYoutubeDL)
+    def test_hooks_drive_task_to_completion(self, _disk: MagicMock) -> None:
+        """Both streams are summed, the merge is flagged and the file is found."""
+        task = DownloadTask(task_id="hooks")
+        YtDlpService.download_merged_with_progress(
+            "https://www.youtube.com/watch?v=test", "bestvideo+bestaudio", task
+        )
+        try:
+            assert task.status == "completed"
+            assert task.total_bytes == 150
+            assert task.phase == "merge"
+            assert task.file_size == 150
+            assert task.file_path is not None and Path(task.file_path).exists()
+        finally:
+            shutil.rmtree(task.temp_dir or "", ignore_errors=True)
+
+    @patch("app.services.yt_dlp_service.check_disk_space")
+    @patch("app.services.yt_dlp_service._DOWNLOAD_TIMEOUT_SECONDS", 0.2)
+    @patch("app.services.yt_dlp_service.yt_dlp.YoutubeDL", _StalledYoutubeDL)
+    def test_stalled_download_fails_at_deadline(self, _disk: MagicMock) -> None:
+        """A download with no hook calls still fails once the deadline passes."""
+        _StalledYoutubeDL.release.clear()
+        _StalledYoutubeDL.merge_raised.clear()
+        task = DownloadTask(task_id="stalled")
+        started = time.monotonic()
+        YtDlpService.download_merged_with_progress(
+            "https://www.youtube.com/watch?v=test", "bestvideo+bestaudio", task
+        )
+        assert time.monotonic() - started < 2
+        assert task.status == "failed"
+        assert "timed out" in (task.error or "")
+
+        # The worker resumes past the deadline: its next hook aborts it
+        _StalledYoutubeDL.release.set()
+        assert _StalledYoutubeDL.merge_raised.wait(timeout=5)
+        assert task.phase != "merge"
+
+
+class TestDownloadMergedMultiQuality:
+    """Tests for deriving several qualities from one download."""
+
+    def test_single_ffmpeg_pass_for_lower_heights(self) -> None:
+        """The top height is downloaded; the others come from one ffmpeg run."""
+        with (
+            patch.object(
+                YtDlpService,
+                "download_merged_to_file",
+                return_value=("/tmp/ytdl_x/abc.mp4", "/tmp/ytdl_x"),
+            ) as mock_download,
+            patch("app.services.yt_dlp_service.subprocess.run") as mock_run,
+        ):
+            mock_run.return_value = MagicMock(returncode=0)
+            outputs, temp_dir = YtDlpService.download_merged_multi_quality(
+                "https://www.youtube.com/watch?v=test", [720, 1080, 480]
+            )
+
+        assert "height<=1080" in mock_download.call_args.args[1]
+        mock_run.assert_called_once()
+        cmd = mock_run.call_args.args[0]
+        assert cmd.count("-i") == 1
+        assert "scale=-2:720" in cmd and "scale=-2:480" in cmd
+        assert outputs == {
+            1080: "/tmp/ytdl_x/abc.mp4",
+            720: "/tmp/ytdl_x/abc_720p.mp4",
+            480: "/tmp/ytdl_x/abc_480p.mp4",
+        }
+        assert temp_dir == "/tmp/ytdl_x"
+
+
+class TestProgressTemplate:
+    """The --progress-template must render as one JSON object per update."""
+
+    def test_renders_json_with_nulls_for_missing_fields(self) -> None:
+        template = PROGRESS_TEMPLATE.removeprefix("download:")
+        with yt_dlp.YoutubeDL({"quiet": True}) as ydl:
+            line = ydl.evaluate_outtmpl(
+                template,
+                {"progress": {"_percent": 12.5, "downloaded_bytes": 10, "speed": 2.0}},
+            )
+
+        assert orjson.loads(line) == {
+            "p": 12.5, "d": 10, "t": None, "e": None, "s": 2.0, "eta": None,
+            "u": None,
+        }
@@ -30,3 +30,13 @@ class TestBuildYdlOptions:
         youtube = opts["extractor_args"]["youtube"]
         assert "player_client" in youtube
         assert "hls" in youtube["skip"]
+
+    def test_options_built_once_and_copied(self) -> None:
+        """Settings are read on the first call; later calls get fresh copies."""
+        first = YtDlpService._build_ydl_options()
+        first["skip_download"] = False
+        with patch.object(YtDlpService, "_make_ydl_options") as mock_make:
+            second = YtDlpService._build_ydl_options()
+
+        mock_make.assert_not_called()
+        assert second["skip_download"] is True
@@ -0,0 +1,82 @@
+"""Tests for throughput-based download tuning."""
+
+from unittest.mock import patch
+
+from app.core.config import settings
+from app.services import yt_dlp_service as ytdlp_service
+from app.services.yt_dlp_service import YtDlpService
+from app.services.ytdlp.tuning import FAST_TUNING, SLOW_TUNING, ThroughputTuner
+
+_MIB = 1024 * 1024
+
+
+class TestThroughputTuner:
+    def test_unknown_and_mid_band_hosts_keep_settings(self) -> None:
+        tuner = ThroughputTuner()
+        assert tuner.tuning_for("a.example") is None
+        tuner.record("a.example", 5 * _MIB)
+        assert tuner.tuning_for("a.example") is None
+
+    def test_tiers_follow_the_moving_average(self) -> None:
+        tuner = ThroughputTuner()
+        tuner.record("a.example", 20 * _MIB)
+        assert tuner.tuning_for("a.example") is FAST_TUNING
+
+        for _ in range(10):
+            tuner.record("a.example", 0.1 * _MIB)
+        assert tuner.tuning_for("a.example") is SLOW_TUNING
+
+    def test_disabled_by_setting(self) -> None:
+        tuner = ThroughputTuner()
+        tuner.record("a.example", 20 * _MIB)
+        with patch.object(settings, "YTDLP_ADAPTIVE_TUNING", False):
+            assert tuner.tuning_for("a.example") is None
+
+
+    def test_page_host_resolves_to_last_serving_edge(self) -> None:
+        """Rates belong to the CDN edge; the page host follows the latest one."""
+        tuner = ThroughputTuner()
+        tuner.record("edge-a.example", 20 * _MIB, via="www.example.com")
+        assert tuner.tuning_for("www.example.com") is FAST_TUNING
+
+        tuner.record("edge-b.example", 0.1 * _MIB, via="www.example.com")
+        assert tuner.tuning_for("www.example.com") is SLOW_TUNING
+        assert tuner.tuning_for("edge-a.example") is FAST_TUNING
+
+
+class TestRecordThroughput:
+    def test_times_only_the_transfer(self) -> None:
+        """Only the span between progress reports counts, keyed on the edge."""
+        meter = ytdlp_service._TransferMeter()
+        meter.tick(100.0, "https://rr1---sn-x.googlevideo.com/videoplayback?id=1")
+        meter.tick(101.0, "https://rr2---sn-y.googlevideo.com/videoplayback?id=2")
+        meter.tick(102.0, None)
+
+        YtDlpService._record_throughput(
+            "https://www.youtube.com/watch?v=test", 40 * _MIB, meter
+        )
+
+        tuner = YtDlpService._tuner
+        assert tuner._rates == {"rr1---sn-x.googlevideo.com": 20 * _MIB}
+        assert tuner.tuning_for("www.youtube.com") is FAST_TUNING
+
+    def test_no_progress_records_nothing(self) -> None:
+        YtDlpService._record_throughput(
+            "https://www.youtube.com/watch?v=test",
+            40 * _MIB,
+            ytdlp_service._TransferMeter(),
+        )
+        assert YtDlpService._tuner._rates == {}
+
+
+class TestTunedCommand:
+    def test_fast_host_overrides_transfer_flags(self) -> None:
+        """Overrides come after the settings flags, so yt-dlp applies them."""
+        url = "https://www.youtube.com/watch?v=test"
+        YtDlpService._tuner.record("www.youtube.com", 50 * _MIB)
+
+        cmd = YtDlpService.build_download_command(url, "22")
+
+        last = len(cmd) - 1 - cmd[::-1].index("--concurrent-fragments")
+        assert cmd[last + 1] == str(FAST_TUNING.concurrent_fragments)
+        assert cmd[-1] == url